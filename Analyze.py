@@ -1,7 +1,12 @@
 from sys import argv
+from itertools import imap
+import numpy
+import os
 from mrjob.job import MRJob
 from Network.InfectionStatus import InfectionStatus 
 from Network.Node import Node, KeyValuePairNodeSerializer
+from Network.NodeProtocol import NodeProtocol
+from Utilities.Snapshot import Snapshot
 
 class Analyze(MRJob):
     """
@@ -9,11 +14,10 @@ class Analyze(MRJob):
     count by status
     """
 
+    INPUT_PROTOCOL = NodeProtocol
+
     def __init__(self, **kwargs):
-        kwargs['args'] = ['--input-protocol', 'repr'] + \
-                         list(kwargs.get('args', []))
         super(Analyze, self).__init__(**kwargs)
-
         self.statusmap = dict()
         self.hit_list_size = 0
 
@@ -28,7 +32,49 @@ class Analyze(MRJob):
         return self.statusmap.items()
 
     def reducer(self, key, values):
-        yield key, values.next()
+        # Each mapper reports its own counts (and hit-list maximum)
+        yield key, max(values) if key == 'max.hitlist' else sum(values)
+
+    def run_job(self):
+        # Inputs that are all snapshots are analyzed directly from their
+        # columns; otherwise, snapshots are converted to text and the job is
+        # run over every input
+        if not self.args or not all(imap(Snapshot.is_snapshot, self.args)):
+            temporary_paths = []
+            self.args = [Snapshot.as_text(arg, temporary_paths)
+                         for arg in self.args]
+            try:
+                return super(Analyze, self).run_job()
+            finally:
+                map(os.remove, temporary_paths)
+
+        if not self.options.no_output:
+            statusmap = Analyze.combine(map(Analyze.analyze_snapshot,
+                                            self.args))
+            for line in sorted(self.output_protocol().write(key, value)
+                               for key, value in statusmap.items()):
+                self.stdout.write(line + '\n')
+            self.stdout.flush()
+
+    @staticmethod
+    def analyze_snapshot(filename):
+        """ Counts the rows of a snapshot by status (reading its columns) """
+        snapshot = Snapshot.read(filename)
+        statuses, counts = numpy.unique(snapshot.statuses, return_counts=True)
+        statusmap = dict(zip(map(int, statuses), map(int, counts)))
+        if len(snapshot):
+            statusmap['max.hitlist'] = int(numpy.diff(snapshot.offsets).max())
+        return statusmap
+
+    @staticmethod
+    def combine(statusmaps):
+        """ Combines the status counts (and hit-list maxima) of many inputs """
+        combined = dict()
+        for statusmap in statusmaps:
+            for key, value in statusmap.items():
+                combined[key] = max(value, combined.get(key, 0)) \
+                    if key == 'max.hitlist' else combined.get(key, 0) + value
+        return combined
 
 if __name__ == '__main__':
     Analyze(args=argv[1:]).execute()
@@ -0,0 +1,77 @@
+from sys import argv
+from itertools import imap, ifilter
+import Network.Network
+from Network.Node import TabSeparatedNodeSerializer
+from Engine.NetworkState import NetworkState
+from Utilities.Snapshot import Snapshot
+from Utilities.VulnerableStore import VulnerableStore
+
+class Convert:
+    """
+    Converts a network between the tab-separated text format and the binary
+    snapshot format.  The direction of conversion is determined by the
+    format of the input file.
+
+    When a vulnerable store is given, the input is taken to be the frontier
+    output by a propagation that used the store; the stored vulnerable
+    nodes are merged back in to produce the complete network.  In this case
+    the output is written as a snapshot if its name ends in .snapshot, and
+    as text otherwise.
+    """
+
+    @staticmethod
+    def execute(input_filename, output_filename, network,
+                store_filename=None):
+        """
+        Convert the given network file.
+        input_filename: a text or snapshot network file
+        output_filename: the converted output filename
+        network: the network address space under consideration (used when
+                 converting text into a snapshot)
+        store_filename: an optional vulnerable store to merge into the
+                        output
+        """
+        if store_filename is None:
+            if Snapshot.is_snapshot(input_filename):
+                Convert.write_text(Snapshot.read(input_filename).nodes(),
+                                   output_filename)
+            else:
+                NetworkState.load(network, input_filename)\
+                    .save_snapshot(output_filename)
+        elif Snapshot.is_snapshot(input_filename):
+            Convert.write(network, 
+                          VulnerableStore.load(store_filename).merge(
+                              Snapshot.read(input_filename).nodes()),
+                          output_filename)
+        else:
+            with open(input_filename) as stream:
+                Convert.write(network, 
+                              VulnerableStore.load(store_filename).merge(
+                                  imap(TabSeparatedNodeSerializer.deserialize,
+                                       ifilter(lambda line: line.strip(),
+                                               stream))),
+                              output_filename)
+
+    @staticmethod
+    def write(network, nodes, output_filename):
+        """ Writes nodes in the format indicated by the output filename """
+        if Snapshot.is_snapshot_filename(output_filename):
+            NetworkState.from_nodes(network, nodes)\
+                .save_snapshot(output_filename)
+        else:
+            Convert.write_text(nodes, output_filename)
+
+    @staticmethod
+    def write_text(nodes, output_filename):
+        """ Writes nodes to a tab-separated network file """
+        with open(output_filename, 'w') as output:
+            for node in nodes:
+                output.write(TabSeparatedNodeSerializer.serialize(node) + '\n')
+
+if __name__ == '__main__':
+    if len(argv) not in [4, 5]:
+        print 'Usage: python Convert.py network_class input_filename ' + \
+                       'output_filename [vulnerable_store]'
+    else:
+        Convert.execute(argv[2], argv[3], getattr(Network.Network, argv[1]),
+                        argv[4] if len(argv) == 5 else None)
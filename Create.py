@@ -2,10 +2,13 @@ from sys import argv
 import tempfile
 import os
 from functools import partial
+from itertools import imap
 from Creation.CreateHitLists import CreateHitLists
 from Creation.CreateVulnerableHosts import CreateVulnerableHosts
 import Network.Network 
 from Network.Node import TabSeparatedNodeSerializer
+from Engine.NetworkState import NetworkState
+from Utilities.Snapshot import Snapshot
 
 class Create:
     """
@@ -22,7 +25,8 @@ class Create:
     def execute(filename, network, nodes_to_infect, hit_list_size):
         """
         Create a new network with the given filename.
-        filename: output filename
+        filename: output filename (written as a binary snapshot if it ends in
+                  .snapshot)
         network: the network address space under consideration
         nodes_to_infect: the number of nodes to mark initially-infected
         hit_list_size: the initial hit-list size for infected nodes
@@ -30,16 +34,22 @@ class Create:
         try:
             # Create our list of vulnerable nodes
             with tempfile.NamedTemporaryFile('w', delete=False) as file:
-                for host in CreateVulnerableHosts.execute(network, 
+                for host in CreateVulnerableHosts.execute(network,
                                                            nodes_to_infect):
                     file.write(TabSeparatedNodeSerializer.serialize(host)+'\n')
 
             # Then run a map/reduce job that marks some nodes as infected
-            with CreateHitLists(args=['--size',str(hit_list_size), file.name])\
-                    .make_runner() as runner:
+            with CreateHitLists(args=['--size', str(hit_list_size),
+                                      '--infected', str(nodes_to_infect),
+                                      file.name]).make_runner() as runner:
                 runner.run()
-                with open(filename, 'w') as output:
-                    map(output.write, runner.stream_output())
+                if Snapshot.is_snapshot_filename(filename):
+                    NetworkState.from_nodes(network,
+                        imap(TabSeparatedNodeSerializer.deserialize,
+                             runner.stream_output())).save_snapshot(filename)
+                else:
+                    with open(filename, 'w') as output:
+                        map(output.write, runner.stream_output())
         finally:
             os.remove(file.name)
 
@@ -1,9 +1,15 @@
 from sys import argv
+import heapq
+from itertools import imap
+import json
 from mrjob.job import MRJob
+from mrjob.protocol import JSONProtocol
 import mrjob.util
 import random
-from Network.InfectionStatus import InfectionStatus 
+import tempfile
+from Network.InfectionStatus import InfectionStatus
 from Network.Node import Node
+from Network.NodeProtocol import NodeProtocol
 
 class CreateHitLists(MRJob):
     """
@@ -13,58 +19,113 @@ class CreateHitLists(MRJob):
 
     Hit lists are used to increase the initial speed of propogation.
 
-    Uses a map/reduce job to effectuate this process; requires O(m)
-    space to create hit lists, where m is the number of vulnerable
-    hosts assigned to a particular map job.  
-    
-    This is a bit suboptimal, since an infected node will only receive
-    nodes within its local mapping scope, but is probably sufficient.
+    Uses a map/reduce job to effectuate this process.  Hit lists are drawn
+    uniformly from the global vulnerable population via bottom-k sampling:
+    every vulnerable host is assigned a random priority, and each mapper
+    retains only the hosts with the lowest priorities within its split (as
+    many as the total hit-list demand, i.e. the number of infected hosts
+    times the hit-list size).  A single reducer then merges these into the
+    global lowest-priority pool, which is a uniform sample of the vulnerable
+    hosts, and deals it out among the infected hosts (which are spilled to
+    disk while the pool is merged).  Memory is therefore bounded by the
+    hit-list demand rather than the size of a split or the number of
+    infected hosts.
+
+    The number of infected hosts should be indicated via the infected
+    switch; if more infected hosts are encountered, hit lists will overlap
+    (each is nonetheless a uniform sample).
     """
 
+    INPUT_PROTOCOL = NodeProtocol
+    INTERNAL_PROTOCOL = JSONProtocol
+    OUTPUT_PROTOCOL = NodeProtocol
+
+    # Intermediate key under which infected hosts and pool candidates meet
+    hit_list_key = -1
+
     def __init__(self, **kwargs):
         mrjob.util.log_to_stream(level=mrjob.util.logging.ERROR)
-        kwargs['args'] = ['--input-protocol', 'repr'] + \
-                         list(kwargs.get('args', []))
-
         super(CreateHitLists, self).__init__(**kwargs)
-        self.infected_nodes = []
-        self.vulnerable_nodes = []
-    
+        # A max-heap (via negated priorities) of the lowest-priority hosts
+        self.candidates = []
+
     def configure_options(self):
         super(CreateHitLists, self).configure_options()
         self.add_passthrough_option(
             '--size', type='int', default=1, help='Indicate the desired \
                                        hit-list size of for vulnerable nodes.')
+        self.add_passthrough_option(
+            '--infected', type='int', default=1, help='Indicate the number \
+                                       of infected nodes in the network.')
+
+    @property
+    def demand(self):
+        """ The total number of hit-list entries required """
+        return self.options.size * self.options.infected
 
     def mapper(self, key, value):
-        # If the node is infected, save it for emission during mapper_final
-        # Otherwise, emit it
-        # Note that in both cases the node is appended it its appropriate list
-        # (either infected or vulnerable)
+        # If the node is infected, send it on to be assigned a hit list
+        # Otherwise, emit it, and consider it for the candidate pool
         node = Node.serializer.deserialize((key, value))
         if(node.status == InfectionStatus.INFECTED):
-            self.infected_nodes.append(node)
+            yield CreateHitLists.hit_list_key, \
+                  ['infected', node.address, node.propagation_delay,
+                   node.source]
         else:
-            self.vulnerable_nodes.append(node)
-            yield key, value
-       
+            yield key, [node.status, list(node.hit_list),
+                        node.propagation_delay, node.source]
+            if self.demand > 0:
+                candidate = (-random.random(), node.address)
+                if len(self.candidates) < self.demand:
+                    heapq.heappush(self.candidates, candidate)
+                elif candidate > self.candidates[0]:
+                    heapq.heapreplace(self.candidates, candidate)
+
     def mapper_final(self):
-        # Here we handle infected nodes (which were not emitted during the 
-        # mapper)
-        # For each such node, create a hit list, attach it, and then emit 
-        # the result.
-        for infected_node in self.infected_nodes:
-            infected_node.hit_list = \
-                map(lambda n: n.address, 
-                    random.sample(self.vulnerable_nodes, 
-                                  min(self.options.size, 
-                                      len(self.vulnerable_nodes))))
-            yield Node.serializer.serialize(infected_node)
+        # Send our (lowest-priority) candidates along to be merged
+        for priority, address in self.candidates:
+            yield CreateHitLists.hit_list_key, \
+                  ['candidate', -priority, address]
 
     def reducer(self, key, values):
-        # Identity reducer.  Expecting one value per key.
-        yield key, values.next()
+        if key == CreateHitLists.hit_list_key:
+            for result in self.assign_hit_lists(values):
+                yield result
+        else:
+            # Identity reducer.  Expecting one value per key.
+            yield key, values.next()
+
+    def assign_hit_lists(self, values):
+        """
+        Merges the candidate pools of each mapper, and deals the result out
+        as hit lists for each infected node.  Infected nodes are streamed to
+        a temporary file until the pool is complete, rather than collected.
+        """
+        candidates = []
+        with tempfile.TemporaryFile() as infected_nodes:
+            for value in values:
+                if value[0] == 'infected':
+                    infected_nodes.write(json.dumps(value[1:]) + '\n')
+                elif len(candidates) < self.demand:
+                    heapq.heappush(candidates, (-value[1], value[2]))
+                elif -value[1] > candidates[0][0]:
+                    heapq.heapreplace(candidates, (-value[1], value[2]))
+
+            # The pool is a uniform sample; shuffle it so that it may be dealt
+            pool = map(lambda (_, address): address, candidates)
+            random.shuffle(pool)
+            size = min(self.options.size, len(pool))
+
+            infected_nodes.seek(0)
+            for index, (address, propagation_delay, source) in \
+                    enumerate(imap(json.loads, infected_nodes)):
+                # Deal disjoint hit lists while the pool lasts
+                if (index + 1) * size <= len(pool):
+                    hit_list = pool[index * size:(index + 1) * size]
+                else:
+                    hit_list = random.sample(pool, size)
+                yield address, (InfectionStatus.INFECTED, hit_list,
+                                propagation_delay, source)
 
 if __name__ == '__main__':
     CreateHitLists(args=argv[1:]).execute()
-
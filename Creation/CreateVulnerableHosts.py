@@ -1,7 +1,6 @@
 from sys import argv
-import random
-from itertools import imap, chain
-from functools import partial
+from itertools import izip
+import numpy
 import Network.Network
 from Network.Node import Node
 from Network.Node import TabSeparatedNodeSerializer
@@ -12,40 +11,99 @@ class CreateVulnerableHosts():
     """
     Class used to generate an initial set of vulnerable addresses
     Expected to be initialized with a network (to identify address space
-    and expose a node factory).  Additionally, zero or more nodes will be 
-    marked as being initially infected.  
+    and expose a node factory).  Additionally, zero or more nodes will be
+    marked as being initially infected.
+
+    Addresses are sampled without replacement (so no two nodes share an
+    address) in vectorized chunks, and nodes are emitted in address order.
+    The initially-infected nodes are chosen from among the sampled nodes.
     """
+
+    # The (approximate) number of addresses sampled at once
+    chunk_size = 2**18
+
     @staticmethod
-    def execute(network, nodes_to_infect=1):
-        """ 
+    def execute(network, nodes_to_infect=1, random=None):
+        """
         Generate infected and vulnerable nodes for the given network.
         nodes_to_infect indicates the number of initially-infected nodes.
+        random optionally supplies a numpy RandomState used for sampling.
+        """
+        random = random or numpy.random.RandomState()
+        count = long(network.address_space * network.probability_vulnerable)
+
+        # Choose the (sorted) positions of the infected nodes
+        infected_positions = numpy.sort(
+            random.permutation(count)[:min(nodes_to_infect, count)])
+
+        position = 0
+        for addresses in CreateVulnerableHosts.sample(network.address_space,
+                                                      count, random):
+            infected = numpy.zeros(len(addresses), dtype=bool)
+            infected[infected_positions[
+                (infected_positions >= position) &
+                (infected_positions < position + len(addresses))] -
+                position] = True
+            position += len(addresses)
+
+            for address, is_infected in izip(addresses, infected):
+                yield network.create_host(int(address),
+                    InfectionStatus.INFECTED if is_infected
+                    else InfectionStatus.VULNERABLE)
+
+    @staticmethod
+    def sample(address_space, count, random):
+        """
+        Samples count distinct addresses from the given address space, and
+        generates them as a series of sorted arrays (in address order).
+
+        The address space is divided into equal ranges, and the number of
+        addresses in each range is drawn from a multinomial distribution
+        (for sparse networks, indistinguishable from the exact hypergeometric
+        split).  Dense networks are sampled as a single range.
         """
-        create_vulnerable_host = partial(network.create_host, 
-                                         status=InfectionStatus.VULNERABLE)
-        create_infected_host = partial(network.create_host, 
-                                       status=InfectionStatus.INFECTED)
-
-        # Create iterations of infected and vulnerable addresses
-        # These may overlap, we'll have to deal with that during propagation
-        infected_addresses = imap(
-            lambda _: random.randint(0, network.address_space - 1), 
-            CreateVulnerableHosts.__longrange(nodes_to_infect))
-        vulnerable_addresses = imap(
-            lambda _: random.randint(0, network.address_space - 1), 
-            CreateVulnerableHosts.__longrange(long(
-                network.address_space * network.probability_vulnerable) - 
-                    nodes_to_infect))
-
-        return chain(imap(create_infected_host, infected_addresses), 
-                      imap(create_vulnerable_host, vulnerable_addresses))
+        chunks = 1 if count * 4 > address_space else \
+                 max(1, -(-count // CreateVulnerableHosts.chunk_size))
+        width = address_space // chunks
+        bounds = map(lambda chunk: chunk * width, xrange(chunks)) + \
+                 [address_space]
+        counts = random.multinomial(count, [1.0 / chunks] * chunks)
+
+        for chunk in xrange(chunks):
+            yield CreateVulnerableHosts._distinct(
+                bounds[chunk], bounds[chunk + 1], counts[chunk], random)
 
     @staticmethod
-    def __longrange(count):
-        """ Lazy range implementation that iterates over a long value """
-        while count > 0:
-            yield count
-            count -= 1
+    def _distinct(low, high, count, random):
+        """ Samples count distinct addresses in [low, high), sorted """
+        # Duplicates are discarded and replaced until enough are found; this
+        # is equivalent to taking the first count distinct values of a
+        # uniform sequence, and is therefore uniform over all subsets
+        addresses = numpy.unique(
+            CreateVulnerableHosts._uniform(high - low, count, random))
+        while len(addresses) < count:
+            addresses = numpy.unique(numpy.concatenate([addresses,
+                CreateVulnerableHosts._uniform(high - low,
+                                               count - len(addresses),
+                                               random)]))
+
+        return addresses + (numpy.uint64(low)
+                            if addresses.dtype == numpy.uint64 else low)
+
+    @staticmethod
+    def _uniform(width, count, random):
+        """ Samples count uniform offsets in [0, width) """
+        if width <= 2**64:
+            return random.randint(0, width, count, dtype=numpy.uint64)
+
+        # Compose wide offsets from 32-bit words (with one extra word, so
+        # that the bias of the final modulus is negligible)
+        words = random.randint(0, 2**32,
+                               (count, (width.bit_length() + 31) / 32 + 1))
+        offsets = numpy.zeros(count, dtype=object)
+        for word in words.T.astype(object):
+            offsets = offsets * 2**32 + word
+        return offsets % width
 
 if __name__ == '__main__':
     """ Use a tab-separated serializer since we're not in a map/reduce job """
@@ -54,7 +112,6 @@ if __name__ == '__main__':
     # Argv[1] specifies the network to use in generation (256-node, IPv4, etc)
     # Argv[2] specifies the number of initial nodes to infect
     for node in CreateVulnerableHosts.execute(
-            getattr(Network, argv[1]), 
+            getattr(Network.Network, argv[1]),
             int(argv[2]) if len(argv) > 2 else 1):
         print Node.serializer.serialize(node)
-
@@ -0,0 +1,271 @@
+import numpy
+from Network.InfectionStatus import InfectionStatus
+from Network.Node import Node
+from Engine.NetworkState import NetworkState
+from Engine.CounterRandom import CounterRandom
+
+class ArrayPropagate:
+    """
+    Propagates a worm infection forward in time, in memory, on a single
+    machine.
+
+    This engine implements the same state machine as the map/reduce job in
+    Propagate.py, but operates on the columnar arrays of a NetworkState.
+    Each iteration is batched: targets are generated for every scanning node
+    at once, membership is tested via binary search over the sorted address
+    array, and the resulting statuses are resolved in bulk via
+    InfectionStatus.compare_arrays.
+
+    Multiple infection attempts against the same address within a single
+    iteration are treated as one INFECTING message (the reducer's total order
+    VULNERABLE <= INFECTING <= INFECTED), with the longest donated hit list,
+    the largest source and the propagation delay carried forward.
+
+    When binomial sampling is enabled, random scans are not generated one
+    by one.  Since every address is equally likely to be scanned, each
+    random scan lands on a node of the network with probability equal to
+    the fraction of the address space occupied by nodes, so the number of
+    hits is binomial.  It is drawn once per iteration, the scans that hit
+    are chosen as a uniform sample of that size, and they are assigned
+    targets uniformly among the nodes.  This is equivalent in distribution
+    to uniform scanning, but only the hits are materialized and searched
+    for; missed scans are accordingly not emitted as volatile edges.
+
+    Random choices are drawn from a counter-based generator keyed on the
+    iteration and the scanning node's address (or, for the number of hits
+    and the sample of scans that hit, on the iteration alone).  An engine
+    may therefore own only a range of the network's nodes (see
+    ParallelPropagate), with attempts against other nodes delivered via
+    exchange, without changing its results.
+    """
+
+    def __init__(self, state, propagation_delay=0, emit_volatile=False,
+                        seed=None, binomial_sampling=False, owned=None):
+        self.state = state
+        self.network = state.network
+        self.propagation_delay = propagation_delay
+        self.emit_volatile = emit_volatile
+        self.binomial_sampling = binomial_sampling
+        self.random = CounterRandom(seed)
+        self.iteration = 0
+        # The range of node indexes scanned and resolved by this engine
+        self.start, self.stop = owned if not owned is None \
+                                else (0, len(state))
+
+    def execute(self, iterations=1):
+        """ Moves the network forward by the given number of iterations """
+        for _ in xrange(iterations):
+            self.step()
+        return self.state
+
+    def step(self):
+        """ Moves the network forward by a single iteration """
+        state = self.state
+        targets, sources, donations = self._scan()
+
+        # Successful edges from the last iteration are resolved alongside the
+        # infection attempts from this one
+        successful, state.successful = state.successful, []
+        indexes, present = state.index(targets)
+        state.volatile = \
+            self._volatile_edges(targets, sources, donations) \
+            if self.emit_volatile else []
+
+        indexes, sources, donations, successful = self.exchange(
+            indexes[present], sources[present],
+            dict((position, donations[message]) for position, message in
+                 enumerate(numpy.flatnonzero(present))
+                 if message in donations),
+            successful)
+        self._resolve_infections(indexes, sources, donations)
+        self._resolve_successful(successful)
+        self.iteration += 1
+
+    def exchange(self, indexes, sources, donations, successful):
+        """
+        Delivers this engine's infection attempts (the node index, source and
+        donated hit list of each, with hit lists keyed by attempt position)
+        and successful edges to the engines owning their nodes, and returns
+        those delivered to this engine, in the same form.  A standalone
+        engine owns every node.
+        """
+        return indexes, sources, donations, successful
+
+    def count_random_scans(self, count):
+        """
+        Given the number of random scans made by this engine, returns the
+        number made by engines owning earlier nodes (the offset of this
+        engine's scans among those of the network) and the number made in
+        total.  A standalone engine owns every node.
+        """
+        return 0, count
+
+    def _scan(self):
+        """
+        Equivalent to the mapper: each infected node that is not delayed
+        chooses a target (from its hit list if possible, otherwise at random),
+        and delayed nodes count down.
+
+        Returns the target addresses, the source addresses and a dictionary
+        of donated hit lists keyed by message index.
+        """
+        state = self.state
+        statuses = state.statuses[self.start:self.stop]
+        delays = state.delays[self.start:self.stop]
+        infected = statuses == InfectionStatus.INFECTED
+        delayed = infected & (delays > 0)
+        delays[delayed] -= 1
+
+        scanners = numpy.flatnonzero(infected & ~delayed) + self.start
+        sources = state.addresses[scanners]
+        targets = numpy.zeros(len(scanners),
+                              NetworkState.address_dtype(self.network)) \
+                  if self.binomial_sampling \
+                  else self._random_addresses(sources)
+        scanning = numpy.ones(len(scanners), dtype=bool)
+        donations = {}
+
+        # Pick from our hit list first, giving the last half of the remainder
+        # to the target (only the scanners holding a hit list are visited)
+        holders = numpy.fromiter(state.hit_lists.iterkeys(), numpy.intp,
+                                 len(state.hit_lists))
+        messages = numpy.searchsorted(scanners, holders)
+        listed = messages < len(scanners)
+        listed[listed] = scanners[messages[listed]] == holders[listed]
+        for message, index in zip(messages[listed], holders[listed]):
+            hit_list = state.hit_lists[index]
+            if hit_list:
+                targets[message] = hit_list.pop()
+                scanning[message] = False
+                if hit_list:
+                    donations[message] = hit_list[len(hit_list)/2:]
+                else:
+                    del state.hit_lists[index]
+
+        if self.binomial_sampling:
+            return self._sample_hits(targets, sources, scanning, donations)
+        return targets, sources, donations
+
+    def _sample_hits(self, targets, sources, scanning, donations):
+        """
+        Replaces the random scans among the given messages with only those
+        scans that hit a node.  The number of hits is binomial over the
+        random scans of the whole network, the scans that hit are a uniform
+        sample of them, and each hit targets a node chosen uniformly.
+        """
+        state = self.state
+        random_messages = numpy.flatnonzero(scanning)
+        offset, total = self.count_random_scans(len(random_messages))
+        hits = random_messages[self._sample_scans(total, offset,
+                                                  len(random_messages))]
+        if len(hits):
+            targets[hits] = state.addresses[self.random.integers(
+                self.iteration, sources[hits], len(state), 2)\
+                    .astype(numpy.intp)]
+
+        # Keep the hit-list messages and the hits, and renumber donations
+        keep = ~scanning
+        keep[hits] = True
+        positions = numpy.cumsum(keep) - 1
+        return targets[keep], sources[keep], \
+               dict((positions[message], hit_list) for message, hit_list in
+                    donations.iteritems())
+
+    def _sample_scans(self, total, offset, count):
+        """
+        Chooses the random scans (of the total made by the network) that hit
+        a node during this iteration, and returns the positions of those
+        among the count scans following the given offset
+        """
+        generator = self.random.generator(self.iteration, 3)
+        hit_count = generator.binomial(
+            total, float(len(self.state)) / self.network.address_space) \
+            if total else 0
+
+        # Sample the smaller of the hits and misses, by drawing positions
+        # until enough distinct positions are found
+        size = min(hit_count, total - hit_count)
+        sample = numpy.zeros(0, numpy.int64)
+        while len(sample) < size:
+            sample = numpy.union1d(sample, generator.randint(
+                0, total, size - len(sample), numpy.int64))
+        if size < hit_count:
+            sample = numpy.setdiff1d(numpy.arange(offset, offset + count),
+                                     sample, assume_unique=True)
+
+        # Keep only the positions among our own scans
+        sample = sample[(sample >= offset) & (sample < offset + count)]
+        return (sample - offset).astype(numpy.intp)
+
+    def _random_addresses(self, sources):
+        """
+        Selects an address uniformly across the full address space on behalf
+        of each source
+        """
+        return self.random.integers(self.iteration, sources,
+                                    self.network.address_space)\
+                   .astype(NetworkState.address_dtype(self.network))
+
+    def _resolve_infections(self, indexes, sources, donations):
+        """
+        Equivalent to the reducer for addresses receiving INFECTING messages.
+        indexes: node index of each (successful) infection attempt
+        sources: attacking address of each attempt
+        donations: donated hit lists, keyed by attempt position
+        """
+        state = self.state
+        if not len(indexes): return
+
+        targets = numpy.unique(indexes)
+        previous_statuses = state.statuses[targets]
+        # Only stable statuses are held in a NetworkState, so the None result
+        # (INFECTING against INFECTING) never arises here
+        result_statuses = InfectionStatus.compare_arrays(
+            previous_statuses, InfectionStatus.INFECTING)
+
+        state.statuses[targets] = result_statuses
+        state.delays[targets] = numpy.maximum(state.delays[targets],
+                                              self.propagation_delay)
+        numpy.maximum.at(state.sources, indexes, sources)
+
+        # Establish the "best" hit list as the longest list available (ties
+        # go to the last attempt)
+        for position, hit_list in sorted(donations.iteritems()):
+            index = indexes[position]
+            if len(hit_list) >= len(state.hit_lists.get(index, [])):
+                state.hit_lists[index] = hit_list
+
+        # New infections send a back-link edge to the attacking node
+        new_infections = targets[
+            (result_statuses == InfectionStatus.INFECTED) &
+            (previous_statuses != InfectionStatus.INFECTED)]
+        victims = state.addresses[new_infections]
+        attackers, present = state.index(state.sources[new_infections])
+        state.successful = zip(attackers[present],
+                               map(int, victims[present]))
+
+    def _resolve_successful(self, successful):
+        """
+        Equivalent to the reducer for addresses receiving SUCCESSFUL edges.
+        The attacker's hit list is cut in half (it was sent to the newly-
+        infected node), and its delay is at least the propagation delay.
+        """
+        state = self.state
+        for index, victim in successful:
+            hit_list = state.hit_lists.get(index)
+            if hit_list:
+                state.hit_lists[index] = hit_list[:len(hit_list)/2]
+                if not state.hit_lists[index]:
+                    del state.hit_lists[index]
+            state.delays[index] = max(state.delays[index],
+                                      self.propagation_delay)
+            state.sources[index] = max(state.sources[index], victim)
+
+    def _volatile_edges(self, targets, sources, donations):
+        """ Packages this iteration's infection attempts as INFECTING nodes """
+        return map(lambda message: Node(targets[message],
+                                        InfectionStatus.INFECTING,
+                                        donations.get(message, []),
+                                        self.propagation_delay,
+                                        int(sources[message])),
+                   xrange(len(targets)))
@@ -0,0 +1,60 @@
+import random
+import numpy
+from Utilities.Hashing import Hashing
+
+class CounterRandom:
+    """
+    Counter-based random number generator.
+
+    Rather than advancing a sequential generator, each draw is a hash of the
+    seed, the iteration, a stream number and a key (generally the address of
+    the node on whose behalf the draw is made).  A node's draws therefore do
+    not depend on which other nodes draw, or in what order, so a network may
+    be divided among several engines without changing its results.
+    """
+
+    iteration_step = 0x9e3779b97f4a7c15
+    stream_step = 0xd1b54a32d192ed03
+
+    def __init__(self, seed=None):
+        self.seed = seed if not seed is None else random.getrandbits(63)
+
+    def words(self, iteration, keys, stream=0):
+        """ Draws a uniform 64-bit word for each key """
+        counter = Hashing.mix(
+            (self.seed + iteration * CounterRandom.iteration_step +
+             stream * CounterRandom.stream_step) & Hashing.mask)
+        return Hashing.mix_array(Hashing.mix_array(
+            Hashing.fold_array(keys) ^ numpy.uint64(counter)))
+
+    def generator(self, iteration, stream=0):
+        """
+        Creates a sequential generator (a numpy RandomState) keyed on the
+        seed, the iteration and a stream number alone, for draws that are
+        made once on behalf of the whole network
+        """
+        word = int(self.words(iteration, numpy.zeros(1, numpy.uint64),
+                              stream)[0])
+        return numpy.random.RandomState([word & 0xffffffff, word >> 32])
+
+    def uniform(self, iteration, keys, stream=0):
+        """ Draws a uniform float in [0, 1) for each key """
+        return (self.words(iteration, keys, stream) >> numpy.uint64(11)) * \
+               2.0**-53
+
+    def integers(self, iteration, keys, limit, stream=0):
+        """
+        Draws a uniform integer in [0, limit) for each key.  Limits wider
+        than 64 bits are composed from several words (as Python longs).
+        """
+        if limit < 2**64:
+            return self.words(iteration, keys, stream) % numpy.uint64(limit)
+        elif limit == 2**64:
+            return self.words(iteration, keys, stream)
+
+        # Compose wide values from words drawn in streams of their own
+        values = numpy.zeros(len(keys), dtype=object)
+        for word in xrange((limit.bit_length() + 63) / 64 + 1):
+            values = values * 2**64 + self.words(
+                iteration, keys, ((stream + 1) << 8) + word).astype(object)
+        return values % limit
@@ -0,0 +1,221 @@
+from itertools import imap, ifilter
+import numpy
+from Network.InfectionStatus import InfectionStatus
+from Network.Node import Node, TabSeparatedNodeSerializer
+from Utilities.Snapshot import Snapshot
+
+class NetworkState:
+    """
+    Columnar, in-memory representation of a network.
+
+    Addresses are held in a sorted array, with parallel arrays holding the
+    status, propagation delay and source of each node.  Hit lists are sparse
+    (only infected nodes carry them), and are held in a dictionary keyed by
+    node index.
+
+    Transient records that are carried between iterations are also tracked:
+    successful edges (back-links to an attacker that have not yet been
+    resolved) and volatile edges (infection attempts from the most recent
+    iteration, emitted only for analysis).
+    """
+
+    def __init__(self, network, addresses, statuses, delays, sources,
+                        hit_lists=None):
+        self.network = network
+        self.addresses = addresses
+        self.statuses = statuses
+        self.delays = delays
+        self.sources = sources
+        self.hit_lists = hit_lists if not hit_lists is None else {}
+        # Pending successful edges as (attacker index, victim address) pairs
+        self.successful = []
+        # Volatile edges as Node instances (status INFECTING)
+        self.volatile = []
+
+    def __len__(self):
+        return len(self.addresses)
+
+    @staticmethod
+    def address_dtype(network):
+        """
+        Identifies the array type used to hold addresses in the given network
+        (see Network.address_dtype).
+        """
+        return network.address_dtype()
+
+    def index(self, addresses):
+        """
+        Locates the given addresses in this network.
+        Returns a pair of arrays: the candidate index of each address, and a
+        mask indicating which addresses are actually present.
+        """
+        indexes = numpy.searchsorted(self.addresses, addresses)
+        present = indexes < len(self.addresses)
+        present[present] = \
+            self.addresses[indexes[present]] == addresses[present]
+        return indexes, present
+
+    @classmethod
+    def from_nodes(cls, network, nodes):
+        """
+        Creates a new state from an iteration of nodes.
+        Duplicate addresses are folded together (as they would be during a
+        reduce), successful nodes are held as pending edges and infecting
+        nodes are held as volatile edges.
+        """
+        addresses, statuses, delays, sources = [], [], [], []
+        hit_lists = {}
+        successful = []
+        volatile = []
+
+        for node in nodes:
+            if node.status == InfectionStatus.SUCCESSFUL:
+                successful.append((node.address, node.source))
+            elif node.status == InfectionStatus.INFECTING:
+                volatile.append(node)
+            else:
+                if node.hit_list:
+                    hit_lists[len(addresses)] = list(node.hit_list)
+                addresses.append(node.address)
+                statuses.append(node.status)
+                delays.append(node.propagation_delay)
+                sources.append(node.source)
+
+        dtype = cls.address_dtype(network)
+        addresses = numpy.array(addresses, dtype=dtype)
+        order = numpy.argsort(addresses, kind='mergesort')
+        positions = numpy.empty(len(order), dtype=numpy.int64)
+        positions[order] = numpy.arange(len(order))
+
+        state = cls(network, addresses[order],
+                    numpy.array(statuses, dtype=numpy.int8)[order],
+                    numpy.array(delays, dtype=numpy.int32)[order],
+                    numpy.array(sources, dtype=dtype)[order],
+                    dict((positions[index], hit_list) for index, hit_list in
+                         hit_lists.iteritems()))
+        state._fold_duplicates()
+
+        indexes, present = \
+            state.index(numpy.array(map(lambda (a, _): a, successful),
+                                    dtype=dtype))
+        state.successful = [(index, source) for index, (_, source), found in
+                                zip(indexes, successful, present) if found]
+        state.volatile = volatile
+        return state
+
+    def _fold_duplicates(self):
+        """
+        Folds nodes sharing an address into a single node, and discards
+        nodes that are not stable.
+        """
+        duplicates = numpy.flatnonzero(self.addresses[1:] ==
+                                       self.addresses[:-1]) + 1
+        keep = numpy.ones(len(self.addresses), dtype=bool)
+
+        # Fold each duplicate into the first node with its address
+        for index in duplicates:
+            first = index - 1
+            while not keep[first]: first -= 1
+            self.statuses[first] = InfectionStatus.compare(
+                self.statuses[first], self.statuses[index])
+            self.delays[first] = max(self.delays[first], self.delays[index])
+            self.sources[first] = max(self.sources[first], self.sources[index])
+            hit_list = self.hit_lists.pop(index, [])
+            if len(hit_list) >= len(self.hit_lists.get(first, [])) and \
+                    hit_list:
+                self.hit_lists[first] = hit_list
+            keep[index] = False
+
+        keep &= (self.statuses == InfectionStatus.VULNERABLE) | \
+                (self.statuses == InfectionStatus.INFECTED) | \
+                (self.statuses == InfectionStatus.IMMUNE)
+
+        if not keep.all():
+            positions = numpy.cumsum(keep) - 1
+            self.hit_lists = dict((positions[index], hit_list) for
+                                  index, hit_list in self.hit_lists.iteritems()
+                                  if keep[index])
+            self.addresses = self.addresses[keep]
+            self.statuses = self.statuses[keep]
+            self.delays = self.delays[keep]
+            self.sources = self.sources[keep]
+
+    @classmethod
+    def load(cls, network, filename):
+        """ Loads a state from a snapshot or tab-separated network file """
+        if Snapshot.is_snapshot(filename):
+            return cls.from_snapshot(Snapshot.read(filename))
+        with open(filename) as stream:
+            return cls.from_nodes(network,
+                imap(TabSeparatedNodeSerializer.deserialize,
+                     ifilter(lambda line: line.strip(), stream)))
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+        Creates a new state from a snapshot.  The node columns of the state
+        reference the (copy-on-write) mapped snapshot directly.
+        """
+        nodes = snapshot.node_count
+        state = cls(snapshot.network, snapshot.addresses[:nodes],
+                    snapshot.statuses[:nodes], snapshot.delays[:nodes],
+                    snapshot.sources[:nodes],
+                    dict((row, map(int, snapshot.hit_list(row))) for row in
+                         numpy.flatnonzero(numpy.diff(
+                             snapshot.offsets[:nodes + 1]))))
+
+        edges = list(snapshot.nodes(nodes))
+        state.volatile = filter(
+            lambda n: n.status == InfectionStatus.INFECTING, edges)
+        successful = filter(
+            lambda n: n.status == InfectionStatus.SUCCESSFUL, edges)
+        indexes, present = state.index(numpy.array(
+            map(lambda n: n.address, successful),
+            dtype=cls.address_dtype(snapshot.network)))
+        state.successful = [(index, node.source) for index, node, found in
+                                zip(indexes, successful, present) if found]
+        return state
+
+    def nodes(self):
+        """
+        Generates the nodes in this state, followed by any pending successful
+        and volatile edges.
+        """
+        for index in xrange(len(self.addresses)):
+            yield Node(self.addresses[index], int(self.statuses[index]),
+                       self.hit_lists.get(index, []),
+                       int(self.delays[index]), int(self.sources[index]))
+        for edge in self.edges():
+            yield edge
+
+    def edges(self):
+        """ Generates the pending successful and volatile edges """
+        for index, source in self.successful:
+            yield Node(self.addresses[index], InfectionStatus.SUCCESSFUL,
+                       source=source)
+        for node in self.volatile:
+            yield node
+
+    def save(self, stream):
+        """ Writes this state to a stream in tab-separated form """
+        for node in self.nodes():
+            stream.write(TabSeparatedNodeSerializer.serialize(node) + '\n')
+
+    def save_snapshot(self, filename):
+        """ Writes this state to a snapshot file """
+        edges = list(self.edges())
+        hit_lists = dict(self.hit_lists)
+        hit_lists.update((len(self) + row, edge.hit_list) for row, edge in
+                         enumerate(edges) if edge.hit_list)
+
+        column = lambda values, field, dtype: numpy.concatenate(
+            [values, numpy.array(map(lambda n: getattr(n, field), edges),
+                                 dtype=dtype)])
+        dtype = self.address_dtype(self.network)
+
+        Snapshot.write(filename, self.network, len(self),
+            column(self.addresses, 'address', dtype),
+            column(self.sources, 'source', dtype),
+            column(self.delays, 'propagation_delay', numpy.int32),
+            column(self.statuses, 'status', numpy.int8),
+            hit_lists)
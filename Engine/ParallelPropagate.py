@@ -0,0 +1,193 @@
+import multiprocessing
+from Queue import Empty
+from itertools import imap, chain
+import numpy
+from Engine.ArrayPropagate import ArrayPropagate
+from Engine.CounterRandom import CounterRandom
+
+class ParallelPropagate:
+    """
+    Propagates a worm infection forward in time using several processes on
+    a single machine.
+
+    The address space is divided into contiguous ranges (as in Schimmy
+    propagation; see Network.partition), and each range is owned by a
+    worker process running an ArrayPropagate engine over its nodes.  Node
+    columns are held in shared memory.  During each iteration, every worker
+    scans from its own nodes and sends each other worker a message buffer
+    holding the infection attempts and successful edges that target its
+    nodes.  With binomial sampling, workers first share the number of random
+    scans they make, so that the scans that hit are sampled from those of
+    the whole network.
+
+    Since random choices are keyed on node addresses, and attempts are
+    delivered in the same (source address) order as within a single engine,
+    the results are identical to those of ArrayPropagate with the same seed.
+    """
+
+    def __init__(self, state, processes, propagation_delay=0,
+                        emit_volatile=False, seed=None,
+                        binomial_sampling=False):
+        self.state = state
+        self.processes = processes
+        # Fix the seed now so that every worker shares it
+        self.options = (propagation_delay, emit_volatile,
+                        CounterRandom(seed).seed, binomial_sampling)
+        self.boundaries = self._boundaries()
+
+    def _boundaries(self):
+        """ Identifies the range of node indexes owned by each worker """
+        network = self.state.network
+        partitions = numpy.fromiter(
+            imap(lambda address: network.partition(address, self.processes),
+                 self.state.addresses),
+            numpy.int64, len(self.state))
+        return numpy.searchsorted(partitions,
+                                  numpy.arange(self.processes + 1))
+
+    def execute(self, iterations=1):
+        """ Moves the network forward by the given number of iterations """
+        state = self.state
+        state.statuses = ParallelPropagate._shared(state.statuses)
+        state.delays = ParallelPropagate._shared(state.delays)
+        state.sources = ParallelPropagate._shared(state.sources)
+
+        inboxes = map(lambda _: multiprocessing.Queue(),
+                      xrange(self.processes))
+        results = multiprocessing.Queue()
+        workers = map(lambda worker: multiprocessing.Process(
+                          target=self._work,
+                          args=(worker, iterations, inboxes, results)),
+                      xrange(self.processes))
+
+        for worker in workers:
+            worker.start()
+        try:
+            outputs = self._collect(results, workers)
+        finally:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+                worker.join()
+
+        # Gather the state that is held privately by each worker
+        state.hit_lists, state.successful, state.volatile = {}, [], []
+        for worker in xrange(self.processes):
+            hit_lists, successful, volatile, sources = outputs[worker]
+            state.hit_lists.update(hit_lists)
+            state.successful.extend(successful)
+            state.volatile.extend(volatile)
+            if not sources is None:
+                state.sources[self.boundaries[worker]:
+                              self.boundaries[worker + 1]] = sources
+        return state
+
+    def _collect(self, results, workers):
+        """ Waits for the output of every worker """
+        outputs = {}
+        while len(outputs) < len(workers):
+            try:
+                worker, output = results.get(timeout=1)
+                outputs[worker] = output
+            except Empty:
+                if any(imap(lambda worker: worker.exitcode, workers)):
+                    raise RuntimeError('A propagation worker failed.')
+        return outputs
+
+    def _work(self, worker, iterations, inboxes, results):
+        """ Propagates the nodes owned by a worker (in a worker process) """
+        state = self.state
+        start, stop = self.boundaries[worker], self.boundaries[worker + 1]
+        # Pending successful edges are delivered (in order) by one worker
+        if worker != 0:
+            state.successful = []
+
+        engine = ArrayPropagate(state, *self.options, owned=(start, stop))
+        pending = {}
+        engine.exchange = lambda *messages: self._exchange(
+            worker, engine.iteration, inboxes, pending, *messages)
+        engine.count_random_scans = lambda count: self._count_random_scans(
+            worker, engine.iteration, inboxes, pending, count)
+        engine.execute(iterations)
+
+        results.put((worker, (
+            dict((index, hit_list) for index, hit_list in
+                 state.hit_lists.iteritems() if start <= index < stop),
+            state.successful, state.volatile,
+            state.sources[start:stop] if state.sources.dtype == object
+            else None)))
+
+    def _exchange(self, worker, iteration, inboxes, pending,
+                        indexes, sources, donations, successful):
+        """
+        Sends each worker a buffer holding the attempts and edges targeting
+        its nodes, and merges the buffers received (in worker order)
+        """
+        owners = numpy.searchsorted(self.boundaries, indexes, 'right') - 1
+        edge_owners = numpy.searchsorted(self.boundaries,
+            numpy.array(map(lambda (index, _): index, successful),
+                        dtype=numpy.intp), 'right') - 1
+
+        for owner in xrange(self.processes):
+            selected = numpy.flatnonzero(owners == owner)
+            message_buffer = (indexes[selected], sources[selected],
+                dict((numpy.searchsorted(selected, position), hit_list)
+                     for position, hit_list in donations.iteritems()
+                     if owners[position] == owner),
+                [edge for edge, edge_owner in zip(successful, edge_owners)
+                      if edge_owner == owner])
+            self._send(worker, owner, iteration, inboxes, pending,
+                       message_buffer)
+
+        buffers = self._receive(worker, iteration, inboxes, pending)
+        offsets = numpy.cumsum([0] + map(lambda b: len(b[0]), buffers))
+        return numpy.concatenate(map(lambda b: b[0], buffers)), \
+               numpy.concatenate(map(lambda b: b[1], buffers)), \
+               dict((offset + position, hit_list)
+                    for offset, message_buffer in zip(offsets, buffers)
+                    for position, hit_list in message_buffer[2].iteritems()), \
+               list(chain(*map(lambda b: b[3], buffers)))
+
+    def _count_random_scans(self, worker, iteration, inboxes, pending,
+                                  count):
+        """
+        Shares the number of random scans made by each worker, and returns
+        the number made by earlier workers and the number made in total
+        """
+        for owner in xrange(self.processes):
+            self._send(worker, owner, ('count', iteration), inboxes, pending,
+                       count)
+        counts = self._receive(worker, ('count', iteration), inboxes, pending)
+        return sum(counts[:worker]), sum(counts)
+
+    def _send(self, worker, owner, stage, inboxes, pending, message):
+        """ Sends a message to the given worker for the given stage """
+        if owner == worker:
+            pending[stage, worker] = message
+        else:
+            inboxes[owner].put((stage, worker, message))
+
+    def _receive(self, worker, stage, inboxes, pending):
+        """ Waits for the messages of the given stage (in worker order) """
+        # Messages for a later stage may arrive first; hold them
+        while not all(imap(lambda sender: (stage, sender) in pending,
+                           xrange(self.processes))):
+            sender_stage, sender, message = inboxes[worker].get()
+            pending[sender_stage, sender] = message
+
+        return map(lambda sender: pending.pop((stage, sender)),
+                   xrange(self.processes))
+
+    @staticmethod
+    def _shared(array):
+        """
+        Copies an array into shared memory.  Arrays of Python objects (wide
+        addresses) cannot be shared, and are returned as-is.
+        """
+        if array.dtype == object:
+            return array
+        shared = numpy.frombuffer(
+            multiprocessing.RawArray('b', max(array.nbytes, 1)),
+            array.dtype, len(array))
+        shared[:] = array
+        return shared
@@ -0,0 +1,104 @@
+import sys
+from optparse import OptionParser
+import Network.Network
+from Engine.NetworkState import NetworkState
+from Engine.ArrayPropagate import ArrayPropagate
+from Engine.ParallelPropagate import ParallelPropagate
+from Utilities.Snapshot import Snapshot
+
+class LocalPropagate:
+    """
+    Propagates a worm infection forward by a given number of iterations on
+    a single machine, without map/reduce.
+
+    Accepts the same switches as Propagate.py, and reads and writes the same
+    network files (text or snapshot); the whole network must fit in memory.
+    """
+
+    @staticmethod
+    def configure_options():
+        parser = OptionParser(usage='%prog --network network_type ' +
+                                    '[options] input-network')
+        parser.add_option(
+            '--network', type='string',
+            help='Indicate the class name of the network associated with this '+\
+                  'propagation.')
+        parser.add_option(
+            '--iterations', type='int', default=1,
+            help='Indicate the number of iterations to execute.')
+        parser.add_option(
+            '--propagation-delay', type='int', default=0,
+            help='Indicate the propagation delay for new infections.')
+        parser.add_option(
+            '--emit-volatile', type='int', default=0,
+            help='Indicate whether to emit infecting edges from the last '+\
+                  'iteration.')
+        parser.add_option(
+            '--seed', type='int', default=None,
+            help='Indicate the random seed used to select targets.')
+        parser.add_option(
+            '--binomial-sampling', type='int', default=0,
+            help='Indicate whether to sample only the random scans that '+\
+                  'hit a node (missed scans are never generated).')
+        parser.add_option(
+            '--processes', type='int', default=1,
+            help='Indicate the number of worker processes across which the '+\
+                  'address space is divided.')
+        parser.add_option(
+            '--output', type='string', default=None,
+            help='Indicate a file to which the result is written (standard '+\
+                  'output by default).  Files ending in .snapshot are '+\
+                  'written as binary snapshots.')
+        return parser
+
+    @staticmethod
+    def execute(filename, network, iterations=1, propagation_delay=0,
+                emit_volatile=False, seed=None, output=None,
+                binomial_sampling=False, processes=1):
+        """
+        Propagate the network in the given file and write the result.
+        filename: input network filename
+        network: the network address space under consideration
+        iterations: the number of iterations to execute
+        propagation_delay: the propagation delay for new infections
+        emit_volatile: when set, emit infecting edges from the last iteration
+        seed: the random seed used to select targets
+        output: the file to which the resulting network is written (a
+                snapshot if its name ends in .snapshot); defaults to standard
+                output
+        binomial_sampling: when set, only random scans that hit a node are
+                           sampled
+        processes: the number of worker processes to use (results do not
+                   depend on this value)
+        """
+        state = NetworkState.load(network, filename)
+        if processes > 1:
+            ParallelPropagate(state, processes, propagation_delay,
+                              emit_volatile, seed, binomial_sampling)\
+                .execute(iterations)
+        else:
+            ArrayPropagate(state, propagation_delay, emit_volatile, seed,
+                           binomial_sampling).execute(iterations)
+
+        if output is None:
+            state.save(sys.stdout)
+        elif Snapshot.is_snapshot_filename(output):
+            state.save_snapshot(output)
+        else:
+            with open(output, 'w') as stream:
+                state.save(stream)
+
+if __name__ == '__main__':
+    parser = LocalPropagate.configure_options()
+    options, args = parser.parse_args()
+
+    if options.network is None or len(args) != 1:
+        print '--network switch and input file required.  ' + \
+              'Use --help to display all options.'
+    else:
+        LocalPropagate.execute(args[0],
+                               getattr(Network.Network, options.network),
+                               options.iterations, options.propagation_delay,
+                               options.emit_volatile, options.seed,
+                               options.output, options.binomial_sampling,
+                               options.processes)
@@ -0,0 +1,93 @@
+from array import array
+from itertools import islice
+
+class HitList(object):
+    """
+    Compact hit list of known-vulnerable addresses.
+
+    Addresses are held in an unsigned machine-word array rather than as a
+    list of Python integers; addresses too wide for such an array (as in
+    IPv6) fall back to a list.  Slicing a hit list produces a view onto the
+    same buffer, and popping from a hit list shrinks its view, so cutting a
+    hit list in half (as happens during propagation) copies nothing.  Views
+    never modify their underlying buffer, so they may be shared freely.
+    """
+
+    __slots__ = ('values', 'start', 'stop')
+
+    def __init__(self, addresses=()):
+        self.values = HitList.pack(addresses)
+        self.start = 0
+        self.stop = len(self.values)
+
+    @staticmethod
+    def pack(addresses):
+        """ Packs an iteration of addresses into the most compact buffer """
+        addresses = map(int, addresses)
+        try:
+            return array('L', addresses)
+        except OverflowError:
+            return addresses
+
+    @staticmethod
+    def view(values, start, stop):
+        """ Creates a hit list over a range of an existing buffer """
+        hit_list = HitList.__new__(HitList)
+        hit_list.values, hit_list.start, hit_list.stop = values, start, stop
+        return hit_list
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __nonzero__(self):
+        return self.stop > self.start
+
+    def __iter__(self):
+        return islice(self.values, self.start, self.stop)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return list(self)[index]
+            return HitList.view(self.values, self.start + start,
+                                self.start + max(start, stop))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('hit list index out of range')
+        return self.values[self.start + index]
+
+    def __getslice__(self, start, stop):
+        # Negative bounds have already been offset by the length once
+        return self.__getitem__(slice(max(start, 0), max(stop, 0)))
+
+    def __eq__(self, other):
+        # Hit lists compare equal to any sequence of the same addresses
+        if not isinstance(other, (HitList, list, tuple, array)):
+            return NotImplemented
+        return len(self) == len(other) and list(self) == list(other)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    # Hit lists are mutable (see pop), and so are not hashable
+    __hash__ = None
+
+    def __repr__(self):
+        return 'HitList(%r)' % list(self)
+
+    def __getstate__(self):
+        # Only the visible range of the buffer is pickled
+        return (list(self),)
+
+    def __setstate__(self, (addresses,)):
+        HitList.__init__(self, addresses)
+
+    def pop(self):
+        """ Removes and returns the last address in this hit list """
+        if not self:
+            raise IndexError('pop from empty hit list')
+        self.stop -= 1
+        return self.values[self.stop]
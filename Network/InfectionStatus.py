@@ -11,12 +11,16 @@ class InfectionStatus:
                 This is generally a transition state between vulnerable and 
                 infected, or immune and immune.
     INFECTED = Node is infected and will transmit infecting messages.
+    SUCCESSFUL = Edge back to an attacker, indicating a new infection.
+    HANDOFF = Edge carrying the part of an attacker's hit list that is handed
+              to a node it has newly infected (when hit lists are deferred).
 
     State diagram:
 
     IMMUNE --- any ---> IMMUNE
     UKNOWN --- any ---> UKNOWN
     SUCCESSFUL --- any ---> any
+    HANDOFF --- any ---> any
     INFECTED --- { INFECTING } ---> INFECTED
     VULNERABLE --- { INFECTING, INFECTED } ---> INFECTED   
     VULNERABLE --- { VULNERABLE } ---> VULNERABLE
@@ -33,19 +37,74 @@ class InfectionStatus:
     INFECTING = 2
     INFECTED = 3
     SUCCESSFUL = 4
+    HANDOFF = 5
+
+    # Encodes a None status (the identity of compare) within status arrays
+    NONE = -2
+
+    # Transition table of compare_arrays (built on first use)
+    transition_array = None
 
     @staticmethod
     def compare(left, right):
         """
-        Implements the state diagram above.  Since we have few states,
-        we just use conditionals.
+        Implements the state diagram above via a precomputed transition table.
 
         To more readily allow comparision composition during a reduce,
         we coalesce on None such that compare(x,None)=x and compare(None,x)=x.
         """
-        if left is None or left == InfectionStatus.SUCCESSFUL:
+        try:
+            return InfectionStatus.transitions[left, right]
+        except KeyError:
+            return InfectionStatus._compare_rules(left, right)
+
+    @staticmethod
+    def compare_all(statuses, initial=None):
+        """
+        Reduces a group of statuses via compare in a single call; this is
+        equivalent to reduce(compare, statuses, initial).
+        """
+        transitions = InfectionStatus.transitions
+        result = initial
+        for status in statuses:
+            try:
+                result = transitions[result, status]
+            except KeyError:
+                result = InfectionStatus._compare_rules(result, status)
+        return result
+
+    @staticmethod
+    def compare_arrays(left, right):
+        """
+        Vectorized equivalent of compare over arrays of statuses (either of
+        which may be a single status), in which None is encoded as NONE.
+        Only the array engines need numpy, so it is imported (and the int8
+        transition table built) on first use.
+        """
+        import numpy
+        if InfectionStatus.transition_array is None:
+            transitions = InfectionStatus.transitions
+            InfectionStatus.transition_array = numpy.array(
+                [[InfectionStatus.NONE if transitions[row, column] is None
+                  else transitions[row, column]
+                  for column in _statuses] for row in _statuses],
+                dtype=numpy.int8)
+        return InfectionStatus.transition_array[
+            numpy.asarray(left) - InfectionStatus.NONE,
+            numpy.asarray(right) - InfectionStatus.NONE]
+
+    @staticmethod
+    def _compare_rules(left, right):
+        """
+        Implements the state diagram above.  Since we have few states,
+        we just use conditionals; these are evaluated once for every pair of
+        statuses to build the transition tables.
+        """
+        if left is None or left == InfectionStatus.SUCCESSFUL or \
+                left == InfectionStatus.HANDOFF:
             return right
-        elif right is None or right == InfectionStatus.SUCCESSFUL:
+        elif right is None or right == InfectionStatus.SUCCESSFUL or \
+                right == InfectionStatus.HANDOFF:
             return left
         elif left == InfectionStatus.IMMUNE or right == InfectionStatus.IMMUNE:
             return InfectionStatus.IMMUNE
@@ -63,4 +122,10 @@ class InfectionStatus:
         elif left == InfectionStatus.UNKNOWN and \
               right == InfectionStatus.UNKNOWN:
             return InfectionStatus.UNKNOWN
-        
+
+# Precompute the result of compare for every pair of statuses (including None)
+_statuses = [None] + range(InfectionStatus.UNKNOWN, 
+                           InfectionStatus.HANDOFF + 1)
+InfectionStatus.transitions = dict(
+    ((left, right), InfectionStatus._compare_rules(left, right))
+    for left in _statuses for right in _statuses)
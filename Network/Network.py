@@ -1,7 +1,8 @@
 from Node import Node
 from InfectionStatus import InfectionStatus
-from itertools import ifilter
+from itertools import imap, chain
 import random
+import numpy
 
 class Network:
     """ 
@@ -23,6 +24,54 @@ class Network:
                      [source_address] if not source_address is None else [], 
                      propagation_delay, source_address)
 
+    @classmethod
+    def random_addresses(cls, count):
+        """ 
+        Select a number of addresses uniformly across the full address space 
+        in a single draw.  Returns an array (see address_dtype); addresses 
+        wider than 64 bits (IPv6) are assembled from 64-bit words.
+        """
+        if cls.address_space <= 2**64:
+            return numpy.random.randint(0, cls.address_space, count, 
+                                        dtype=numpy.uint64)
+        addresses = numpy.zeros(count, dtype=object)
+        for _ in xrange(-(-cls.address_bits() // 64)):
+            addresses = (addresses << 64) | \
+                numpy.random.randint(0, 2**64, count, dtype=numpy.uint64)\
+                     .astype(object)
+        return addresses % cls.address_space
+
+    @classmethod
+    def random_targets(cls, sources, count=1):
+        """
+        Select count targets uniformly across the full address space on 
+        behalf of each of the given sources, in a single draw.  Returns an 
+        array holding the targets of each source in turn.
+        """
+        return cls.random_addresses(len(sources) * count)
+
+    @classmethod
+    def address_bits(cls):
+        """ The width of an address in this network (in bits) """
+        return (cls.address_space - 1).bit_length()
+
+    @classmethod
+    def address_dtype(cls):
+        """
+        Identifies the array type used to hold addresses in this network.
+        Address spaces wider than 64 bits (IPv6) fall back to Python longs.
+        """
+        return numpy.uint64 if cls.address_space <= 2**64 else object
+
+    @classmethod
+    def partition(cls, address, partitions):
+        """ 
+        Identifies which of n equally-sized address ranges holds the given
+        address.  Since partitions are contiguous ranges, they preserve
+        address order.
+        """
+        return int(int(address) * partitions // cls.address_space)
+
     @classmethod
     def create_host(cls, address, status=InfectionStatus.UNKNOWN):
         """ Creates a host with the given address and optional status """
@@ -35,18 +84,65 @@ class Network:
         By default this is across the entire address space, but 
         optional parameters can be used to control the addresses examined.
         """
-        return ifilter(lambda address: cls._sample_vulnerable(), 
-                        xrange(start, (size if not(size is None) \
-                                       else cls.address_space) + start))
+        return imap(int, chain.from_iterable(
+            cls.vulnerable_address_chunks(start, size, probability)))
 
     @classmethod
-    def _sample_vulnerable(cls):
-        """ Sample using the probability that a host is vulnerable """
-        return Network._sample(cls.probability_vulnerable)
+    def vulnerable_address_chunks(cls, start=0, size=None, probability=None,
+                                        chunk_size=2**16):
+        """ 
+        Returns an iteration of arrays of vulnerable addresses (see
+        vulnerable_addresses).  
+
+        Each address is vulnerable with the given probability, so rather 
+        than sampling every address, we skip between vulnerable addresses 
+        using geometrically-distributed gaps; the cost is proportional to 
+        the number of vulnerable addresses rather than the size of the range.
+        """
+        probability = cls.probability_vulnerable if probability is None \
+                      else probability
+        end = start + (size if not size is None else cls.address_space)
+        position = start - 1
+        # Use Python longs when addresses could overflow 64 bits
+        dtype = numpy.int64 if end + chunk_size * (end - start) < 2**63 \
+                else object
+
+        while probability > 0 and position < end - 1:
+            addresses = position + numpy.cumsum(
+                Network._geometric_gaps(probability, chunk_size, 
+                                        end - start, dtype))
+            addresses = addresses[addresses < end]
+            if len(addresses):
+                yield addresses
+            if len(addresses) < chunk_size:
+                break
+            position = addresses[-1]
+
+    @staticmethod
+    def _geometric_gaps(probability, count, limit, dtype):
+        """
+        Samples count geometrically-distributed gaps (the number of trials 
+        up to and including the next success), clipped to the given limit.
+        Since gaps are computed in double precision, the low-order bits of 
+        very large gaps (held as Python longs) are filled uniformly.
+        """
+        if probability >= 1:
+            return numpy.ones(count, dtype=dtype)
+
+        gaps = numpy.minimum(numpy.floor(
+            numpy.log(1.0 - numpy.random.random_sample(count)) / 
+            numpy.log1p(-probability)) + 1, float(limit))
+        if dtype != object:
+            return gaps.astype(dtype)
+        else:
+            return numpy.array(map(Network._fill_low_bits, 
+                                   imap(long, gaps)), dtype=object)
 
     @staticmethod
-    def _sample(probability):
-        return random.random() < probability
+    def _fill_low_bits(value):
+        """ Fills the bits of a value beyond double precision uniformly """
+        bits = value.bit_length() - 53
+        return value + random.getrandbits(bits) if bits > 0 else value
         
 
 class Network256(Network):
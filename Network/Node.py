@@ -1,4 +1,6 @@
 from InfectionStatus import InfectionStatus 
+from NodeProtocol import NodeProtocol
+from HitList import HitList
 
 class KeyValuePairNodeSerializer:
     """
@@ -25,36 +27,44 @@ class TabSeparatedNodeSerializer(KeyValuePairNodeSerializer):
     Alternate serializer for node instances.
     Serializes by producing a string representing a node instance,
     string is a tab-separated key-value pair.
-    Keys are node addresses, values are node metadata.
+    Keys are node addresses, values are node metadata; the line format is
+    that of NodeProtocol.
     """
+    protocol = NodeProtocol()
+
     @staticmethod
     def deserialize(text):
-        address, metadata = map(eval, text.split('\t'))
-        status, hit_list, propagation_delay, source = \
-            metadata if not metadata is None \
-            else (InfectionStatus.UNKNOWN, [], 0, 0)
-        return Node(address, status, hit_list, propagation_delay, source)
+        return KeyValuePairNodeSerializer.deserialize(
+            TabSeparatedNodeSerializer.protocol.read(text.rstrip('\r\n')))
 
     @staticmethod
     def serialize(node):
-        return "%s\t%s,%s,%s,%s" % (node.address, node.status, node.hit_list, 
-                                     node.propagation_delay, node.source)
+        return TabSeparatedNodeSerializer.protocol.write(
+            *KeyValuePairNodeSerializer.serialize(node))
 
-class Node:
+class Node(object):
     """
     Represents a node in the network.
 
     All nodes have an address and an infection status. 
     Infected nodes may maintain a hit list of known-vulnerable addresses.   
+
+    Since nodes are created in great numbers during propagation, they are
+    slotted, and hit lists are held as (compact, sliceable) HitList 
+    instances.
     """
 
+    __slots__ = ('address', 'status', 'hit_list', 'propagation_delay', 
+                 'source')
+
     # Maintain a class-bound serializer for nodes
     serializer = KeyValuePairNodeSerializer
 
-    def __init__(self, address, status, hit_list=[], 
+    def __init__(self, address, status, hit_list=(), 
                         propagation_delay=0, source=0):
         self.address = int(address) if not address is None else None
         self.status = status
-        self.hit_list = hit_list
+        self.hit_list = hit_list if isinstance(hit_list, HitList) \
+                        else HitList(hit_list)
         self.propagation_delay = propagation_delay
         self.source = source
@@ -0,0 +1,73 @@
+from InfectionStatus import InfectionStatus
+from Node import Node
+
+class NodeAccumulator(object):
+    """
+    Running fold of the records (nodes and edges) for a single address, as
+    performed by the propagation reducers and combiners.
+
+    Records are consumed one at a time, and only the folded status, the
+    longest hit list, the largest delay and source, and the set of statuses
+    encountered are retained; memory is therefore constant regardless of
+    the number of records (such as infection attempts) for an address.  The
+    sources of successful edges are also retained, since each may receive
+    a hit-list handoff.
+    """
+
+    __slots__ = ('address', 'status', 'hit_list', 'propagation_delay',
+                 'source', 'statuses', 'successful')
+
+    def __init__(self):
+        self.address = None
+        self.status = None
+        self.hit_list = ()
+        self.propagation_delay = None
+        self.source = None
+        self.statuses = set()
+        self.successful = []
+
+    def __nonzero__(self):
+        return bool(self.statuses)
+
+    def add(self, node):
+        """ Folds a record into this accumulator """
+        if not self.statuses:
+            self.address = node.address
+        try:
+            self.status = InfectionStatus.transitions[self.status, node.status]
+        except KeyError:
+            self.status = InfectionStatus.compare(self.status, node.status)
+        # Ties go to the later hit list (as in reduce)
+        if len(node.hit_list) >= len(self.hit_list):
+            self.hit_list = node.hit_list
+        self.propagation_delay = max(self.propagation_delay,
+                                     node.propagation_delay)
+        self.source = max(self.source, node.source)
+        self.statuses.add(node.status)
+        if node.status == InfectionStatus.SUCCESSFUL:
+            self.successful.append(node.source)
+
+    def has_status(self, status):
+        """ Indicates whether a record with the given status was folded """
+        return status in self.statuses
+
+    def is_new_infection(self):
+        """
+        Indicates whether the folded address was infected by one of the
+        records folded (rather than having been infected already)
+        """
+        return self.status == InfectionStatus.INFECTED and \
+               not self.has_status(InfectionStatus.INFECTED) and \
+               self.has_status(InfectionStatus.INFECTING)
+
+    def node(self, status=None, hit_list=None, propagation_delay=None):
+        """
+        Packages the fold into a node (the status, hit list and delay may be
+        overridden with resolved values)
+        """
+        return Node(self.address,
+                    status if not status is None else self.status,
+                    hit_list if not hit_list is None else self.hit_list,
+                    propagation_delay if not propagation_delay is None \
+                        else self.propagation_delay,
+                    self.source)
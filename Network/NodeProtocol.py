@@ -0,0 +1,152 @@
+import re
+from HitList import HitList
+
+class NodeProtocol(object):
+    """
+    Eval-free mrjob protocol for node records.
+
+    Keys are addresses and values are node metadata tuples of the form
+    (status, hit_list, propagation_delay, source).  Each record is written
+    as a line of tab-separated integer fields:
+
+        address  status  propagation_delay  source  [hit-list]
+
+    where the hit list is comma-separated and omitted when empty (hit lists
+    are decoded as HitList instances).  Lines
+    written by the repr and JSON protocols (address followed by a
+    [status, [hit-list], delay, source] list) are also accepted; since all
+    fields are integers, these are parsed positionally without eval.
+
+    Records may also be read with their metadata left encoded (see
+    read_encoded and EncodedNodeValue), in which case it is written back
+    verbatim.
+    """
+
+    legacy_pattern = re.compile(r'-?\d+')
+
+    def read(self, line):
+        """ Decodes a line into an (address, metadata) pair """
+        key, value = line.split('\t', 1)
+        return self.decode_key(key), self.decode_value(value)
+
+    def read_encoded(self, line):
+        """
+        Decodes a line into an (address, EncodedNodeValue) pair; the node
+        metadata is left encoded, aside from its status
+        """
+        key, value = line.split('\t', 1)
+        return self.decode_key(key), EncodedNodeValue.from_text(value)
+
+    def write(self, key, value):
+        """ Encodes an (address, metadata) pair as a line """
+        return '%s\t%s' % (self.encode_key(key), self.encode_value(value))
+
+    def decode_key(self, key):
+        return int(key)
+
+    def encode_key(self, key):
+        return '%d' % key
+
+    @staticmethod
+    def decode_value(value):
+        """ Decodes node metadata """
+        if '[' in value:
+            return NodeProtocol._decode_legacy_value(value)
+
+        fields = value.split('\t')
+        return (int(fields[0]),
+                HitList(fields[3].split(',') \
+                    if len(fields) > 3 and fields[3].strip() else ()),
+                int(fields[1]), int(fields[2]))
+
+    @staticmethod
+    def encode_value(value):
+        """ Encodes node metadata """
+        # Metadata that was never decoded is written back verbatim
+        if isinstance(value, EncodedNodeValue):
+            return value
+
+        status, hit_list, propagation_delay, source = value
+        if len(hit_list):
+            return '%d\t%d\t%d\t%s' % (status, propagation_delay, source,
+                                       ','.join(map(str, hit_list)))
+        else:
+            return '%d\t%d\t%d' % (status, propagation_delay, source)
+
+    @staticmethod
+    def _decode_legacy_value(value):
+        """ Decodes a [status, [hit-list], delay, source] list """
+        fields = map(int, NodeProtocol.legacy_pattern.findall(value))
+        return fields[0], HitList(fields[1:-2]), fields[-2], fields[-1]
+
+class EncodedNodeValue(str):
+    """
+    Node metadata held in its encoded (tab-separated) form, as read by
+    NodeProtocol.read_encoded.  Only the status (the leading field) is
+    decoded on demand; the remaining fields (notably the hit list) are
+    decoded only when requested, and NodeProtocol writes the value back
+    verbatim, so records that are merely passed along are never re-encoded.
+    """
+
+    __slots__ = ()
+
+    @staticmethod
+    def from_text(value):
+        """ Wraps encoded metadata (converting the legacy form) """
+        if '[' in value:
+            value = NodeProtocol.encode_value(
+                NodeProtocol._decode_legacy_value(value))
+        return EncodedNodeValue(value)
+
+    @property
+    def status(self):
+        return int(self.split('\t', 1)[0])
+
+    def decode(self):
+        """ Decodes the complete node metadata """
+        return NodeProtocol.decode_value(self)
+
+class PartitionedNodeProtocol(NodeProtocol):
+    """
+    Internal protocol for jobs using the Schimmy pattern.
+
+    Keys may be (partition, address) pairs, which are written as a comma-
+    separated pair of fixed-width, zero-padded integers so that Hadoop's
+    textual sort agrees with the numeric order of the partition files.
+    Values may be node metadata or (for sentinel keys) integer counts.
+    """
+
+    def __init__(self, address_width=0, partition_width=5):
+        self.address_width = address_width
+        self.partition_width = partition_width
+
+    def decode_key(self, key):
+        if ',' in key:
+            partition, address = key.split(',')
+            return int(partition), int(address)
+        return int(key)
+
+    def encode_key(self, key):
+        if isinstance(key, tuple):
+            return '%0*d,%0*d' % (self.partition_width, key[0],
+                                  self.address_width, key[1])
+        return '%0*d' % (self.address_width, key)
+
+    def read_encoded(self, line):
+        """ As NodeProtocol.read_encoded, but counts are decoded """
+        key, value = line.split('\t', 1)
+        if not '\t' in value and not '[' in value:
+            return self.decode_key(key), int(value)
+        return self.decode_key(key), EncodedNodeValue.from_text(value)
+
+    @staticmethod
+    def decode_value(value):
+        if not '\t' in value and not '[' in value:
+            return int(value)
+        return NodeProtocol.decode_value(value)
+
+    @staticmethod
+    def encode_value(value):
+        if isinstance(value, (int, long)):
+            return '%d' % value
+        return NodeProtocol.encode_value(value)
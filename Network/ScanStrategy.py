@@ -0,0 +1,179 @@
+import random
+import numpy
+from Engine.CounterRandom import CounterRandom
+
+class ScanStrategy(object):
+    """
+    Selects the targets of infected nodes' (random) scans.
+
+    Strategies generate the targets of many sources at once: targets returns
+    an array (see Network.address_dtype) holding the count targets of each
+    source in turn.  The iteration is given so that strategies may advance
+    between iterations; strategies hold no other state, so that every
+    mapper selects targets in the same way.  Random draws are keyed on the
+    seed, the source, the iteration and the scan (see CounterRandom), so a
+    source's targets do not depend on the other sources in its batch.
+
+    Strategies are created by name via ScanStrategy.create:
+        uniform = UniformScan
+        local-subnet = LocalSubnetScan
+        permutation = PermutationScan
+    """
+
+    def __init__(self, network, seed=None):
+        self.network = network
+        self.random = CounterRandom(seed)
+
+    @staticmethod
+    def create(name, network, seed=None):
+        """ Creates the named strategy for the given network """
+        return ScanStrategy.strategies[name](network, seed)
+
+    def targets(self, sources, count=1, iteration=0):
+        """ Selects count targets on behalf of each of the given sources """
+        raise NotImplementedError
+
+    def _scalar(self, value):
+        """ Converts an integer to the network's address type """
+        return numpy.array(value, dtype=self.network.address_dtype())[()]
+
+    def _draws(self, draw, sources, count, iteration, stream):
+        """
+        Makes count keyed draws (via the given CounterRandom method) on
+        behalf of each source, in the order of their targets.  Each scan is
+        drawn from a stream of its own.
+        """
+        sources = numpy.array(sources, dtype=self.network.address_dtype())
+        draws = [draw(iteration, sources, stream=stream * count + scan)
+                 for scan in xrange(count)]
+        return numpy.column_stack(draws).ravel() if draws else \
+               numpy.zeros(0, dtype=self.network.address_dtype())
+
+    def _random_targets(self, sources, count, iteration):
+        """ Selects count targets uniformly on behalf of each source """
+        return self._draws(lambda iteration, keys, stream:
+                               self.random.integers(iteration, keys,
+                                   self.network.address_space, stream),
+                           sources, count, iteration, 0)\
+                   .astype(self.network.address_dtype())
+
+    def _sources(self, sources, count):
+        """ Repeats each source address once for each of its targets """
+        return numpy.repeat(numpy.array(sources,
+                                        dtype=self.network.address_dtype()),
+                            count)
+
+class UniformScan(ScanStrategy):
+    """ Selects targets uniformly across the full address space """
+
+    def targets(self, sources, count=1, iteration=0):
+        return self._random_targets(sources, count, iteration)
+
+class LocalSubnetScan(ScanStrategy):
+    """
+    Prefers targets near the source, in the manner of Code Red II: each scan
+    stays within the source's subnet (sharing all but the low subnet_bits
+    bits of its address) with probability local_probability, and is
+    otherwise uniform.  By default subnets hold the low half of an address
+    (a /16 in IPv4 and a /64 in IPv6).
+    """
+
+    local_probability = 0.5
+
+    def __init__(self, network, seed=None, subnet_bits=None,
+                       local_probability=None):
+        super(LocalSubnetScan, self).__init__(network, seed)
+        self.subnet_bits = subnet_bits or network.address_bits() / 2
+        self.local_probability = local_probability or \
+                                 LocalSubnetScan.local_probability
+
+    def targets(self, sources, count=1, iteration=0):
+        targets = self._random_targets(sources, count, iteration)
+        local = numpy.flatnonzero(
+            self._draws(self.random.uniform, sources, count, iteration, 1) <
+            self.local_probability)
+        host_mask = self._scalar(2**self.subnet_bits - 1)
+        subnet_mask = self._scalar((self.network.address_space - 1) ^
+                                   (2**self.subnet_bits - 1))
+        targets[local] = (self._sources(sources, count)[local] &
+                              subnet_mask) | \
+                         (targets[local] & host_mask)
+        return targets
+
+class PermutationScan(ScanStrategy):
+    """
+    Permutation scanning: every node walks the same pseudorandom permutation
+    of the address space, starting just past its own address, so that nodes
+    rarely repeat one another's scans.  The scans of each iteration continue
+    from where those of the previous iteration ended.
+
+    Walks are offset by iteration * count from the start of the job rather
+    than from a node's infection, so a node infected in a later iteration
+    begins further along its walk (and the offsets assume a constant count).
+    Since a node's walk continues into the positions that follow it, it
+    eventually repeats the scans of any node whose address lies ahead of it
+    in the permutation; with n infected nodes this happens after roughly
+    address_space / n scans, as in permutation scanning proper (where it
+    is the signal for a node to jump to a new position).
+
+    The permutation alternates multiplication by odd constants with
+    xorshifts (both bijections over an address space that is a power of
+    two), and so is evaluated and inverted without any tables.  Its
+    constants are derived from a fixed seed (unless one is given), so all
+    mappers share it.
+    """
+
+    seed = 0x5ca9
+    rounds = 3
+
+    def __init__(self, network, seed=None):
+        super(PermutationScan, self).__init__(network, seed)
+        self.bits = network.address_bits()
+        self.shift = max(self.bits / 2, 1)
+        generator = random.Random(seed or PermutationScan.seed)
+        self.multipliers = [generator.getrandbits(self.bits) | 1
+                            for _ in xrange(PermutationScan.rounds)]
+        self.inverses = map(self._inverse, self.multipliers)
+
+    def targets(self, sources, count=1, iteration=0):
+        positions = self.unpermute(self._sources(sources, count)) + \
+            numpy.tile(numpy.arange(1, count + 1) + iteration * count,
+                       len(sources)).astype(self.network.address_dtype())
+        return self.permute(positions & self._scalar(self.mask))
+
+    @property
+    def mask(self):
+        return self.network.address_space - 1
+
+    def permute(self, addresses):
+        """ Maps an array of positions to the addresses at those positions """
+        mask = self._scalar(self.mask)
+        for multiplier in self.multipliers:
+            addresses = (addresses * self._scalar(multiplier)) & mask
+            addresses = addresses ^ (addresses >> self._scalar(self.shift))
+        return addresses
+
+    def unpermute(self, addresses):
+        """ Maps an array of addresses to their positions (inverts permute) """
+        mask = self._scalar(self.mask)
+        for inverse in reversed(self.inverses):
+            # Undo the xorshift by folding in every multiple of the shift
+            shifted = addresses
+            for _ in xrange(1, -(-self.bits // self.shift)):
+                shifted = shifted >> self._scalar(self.shift)
+                addresses = addresses ^ shifted
+            addresses = (addresses * self._scalar(inverse)) & mask
+        return addresses
+
+    def _inverse(self, multiplier):
+        """ Finds the multiplicative inverse of an odd constant (by Newton) """
+        inverse = multiplier
+        for _ in xrange(7):
+            inverse = (inverse * (2 - multiplier * inverse)) & self.mask
+        return inverse
+
+ScanStrategy.strategies = {
+    'uniform': UniformScan,
+    'local-subnet': LocalSubnetScan,
+    'permutation': PermutationScan
+}
@@ -1,14 +1,20 @@
 from sys import argv
+import os
 from itertools import imap, izip, repeat
 from mrjob.job import MRJob
 from Network.InfectionStatus import InfectionStatus 
 from Network.Node import Node
+from Network.NodeAccumulator import NodeAccumulator
+from Network.NodeProtocol import NodeProtocol, PartitionedNodeProtocol
 import Network.Network
 from Utilities.Package import Package
 from Utilities.Partitions import Partitions
+from Utilities.PropagationJob import PropagationJob
+from Utilities.RangePartitioner import RangePartitioner
+from Utilities.Snapshot import Snapshot
 from Utilities.SchimmyMRJob import SchimmyMRJob
 
-class Propagate(SchimmyMRJob):
+class Propagate(PropagationJob, SchimmyMRJob):
     """
     This class is used to propagate a worm infection forward by a given
     number of iterations.  It uses the Schimmy pattern to optimize the
@@ -16,13 +22,16 @@ class Propagate(SchimmyMRJob):
     in addition to the arguments identified in Propogate.py
     """
 
+    INPUT_PROTOCOL = NodeProtocol
+    OUTPUT_PROTOCOL = NodeProtocol
+
     _initialized = False
 
     def __init__(self, **kwargs):
-        # Note that EMR is required for Schimmy propagation
+        # EMR is used for Schimmy propagation unless another runner is given
+        # (see use_local_partitions for the local runner)
         kwargs['args'] = \
-            ['--input-protocol', 'repr', 
-             '-r', 'emr',
+            ['-r', 'emr',
              '--hadoop-version', '0.20',
              '--hadoop-arg', '-partitioner',
              '--hadoop-arg', 'org.apache.hadoop.mapred.lib.KeyFieldBasedPartitioner',
@@ -32,178 +41,164 @@ class Propagate(SchimmyMRJob):
         super(Propagate, self).__init__(**kwargs)
 
         self.network = getattr(Network.Network, self.options.network)
+        # Snapshot inputs are converted to text before they are partitioned
+        self.args = [Snapshot.as_text(arg, self.temporary_paths)
+                     for arg in self.args]
         # In Schimmy, the #partitions is always equal to #reducers
         self.options.jobconf['mapred.reduce.tasks'] = self.options.partitions
 
         # Initialize exactly once by creating our initial partition files
-        # and packaging the relevant Python scripts
-        if any(self.args) and not Propagate._initialized:
+        # and packaging the relevant Python scripts (tasks run by the local
+        # runner are also given input files, but must not do so again)
+        if any(self.args) and not Propagate._initialized and \
+                not self.is_mapper_or_reducer():
             Propagate._initialized = True
+            # Balance the partitions using a sample of the input
+            if os.path.exists(self.args[0]):
+                self._range_partitioner = RangePartitioner.from_network_file(
+                    self.args[0], self.options.partitions,
+                    self.network.address_space)
             self.options.upload_archives.append('%s#partitions' % \
                 Partitions.create(self.args[0], 
                                   self.options.partitions, 
-                                  self.partition, True))
+                                  self.range_partitioner, True,
+                                  tar_filename=
+                                      self.temporary_file(suffix='.tar.gz'),
+                                  memory_budget=
+                                      self.options.partition_memory * 2**20))
             self.options.python_archives.append(Package.create())
+            # Without Hadoop, partition files are kept in a local directory
+            if self.options.runner == 'local':
+                self.use_local_partitions(self.temporary_directory())
+            # Ship a filter of the network's addresses to our mappers
+            if self.options.bloom_filter:
+                self.create_bloom_filter(self.args)
 
     def configure_options(self):
         super(Propagate, self).configure_options()
-
-        self.add_passthrough_option(
-            '--network', type='string', 
-            help='Indicate the class name of the network associated with this \
-                  propagation, one of { IPv4, IPv6, Network256, \
-                  NetworkGraphable }.')
+        self.add_propagation_options()
         self.add_passthrough_option(
-            '--iterations', type='int', default=1, 
-            help='Indicate the number of iterations to execute.')
-        self.add_passthrough_option(
-            '--propagation-delay', type='int', default=0, 
-            help='Indicate the propagation delay for new infections.')
-        self.add_passthrough_option(
-            '--emit-volatile', type='int', default=0, 
-            help='Indicate whether to emit infecting edges from the last \
-                  iteration.')
-
-    def is_volatile(self, status):
-        """ Indicates if a node is volatile, and expected to change between
-            iterations (or is transient in nature) """            
-        return (self.options.emit_volatile and \
-                 status == InfectionStatus.INFECTING)
+            '--partition-memory', type='int', default=256, 
+            help='Indicate the memory budget (in megabytes) used to sort \
+                  the input into partitions; larger inputs are sorted \
+                  externally.')
 
-    def is_stable(self, status):
+    def internal_protocol(self):
         """ 
-        Identifies if a node should be emitted by the mapper
-        Some states (such as INFECTING) MAY NOT need to be carried forward.
+        Intermediate keys are padded to the width of the network's largest 
+        address, so that Hadoop's textual sort agrees with numeric order.
         """
-        return (status == InfectionStatus.VULNERABLE or
-                 status == InfectionStatus.INFECTED or
-                 status == InfectionStatus.IMMUNE)
-
-    @staticmethod
-    def is_new_infection(result_status, input_statuses):
-        """
-        Indicates if a node has been newly infected.
-        This is defined as (1) being marked as infected,
-        (2) not having previously been marked so, and 
-        (3) having an indication of an current infection attempt        
-        """
-        return result_status == InfectionStatus.INFECTED and \
-                all(imap(lambda status: status != InfectionStatus.INFECTED, 
-                         input_statuses)) and \
-                any(imap(lambda status: status == InfectionStatus.INFECTING, 
-                         input_statuses))
+        return PartitionedNodeProtocol(len(str(self.network.address_space)))
 
     def steps(self):
         return map(lambda _: MRJob.mr(self.mapper, self.reducer, 
-                                        self.mapper_final), 
+                                        self.mapper_final,
+                                        combiner=self.combiner,
+                                        combiner_init=self.combiner_init,
+                                        combiner_final=self.combiner_final,
+                                        mapper_init=self.mapper_init), 
                     xrange(0, self.options.iterations))
 
+    @property
+    def range_partitioner(self):
+        """
+        The range partitioner used to assign keys to partitions.  Its
+        boundaries are sampled from the input at launch, and are shipped
+        alongside the partition files; absent these, the address space is
+        divided into equal ranges.
+        """
+        if "_range_partitioner" not in self.__dict__:
+            filename = 'partitions/%s' % Partitions.boundaries_filename
+            self._range_partitioner = RangePartitioner.load(filename) \
+                if os.path.exists(filename) else \
+                RangePartitioner.equal(self.network.address_space,
+                                       self.options.partitions)
+        return self._range_partitioner
+
+    def get_sentinel(self, partition):
+        """ 
+        Since zero is a valid address, the sentinel is negative; its padded
+        key ('-' precedes every digit) is still sorted first.
+        """
+        return -1
+
+    def is_partition_record(self, key, value):
+        """
+        Only nodes are carried forward in partition files; edges (SUCCESSFUL,
+        HANDOFF and INFECTING records) are consumed from the job output by
+        the following step's mappers.
+        """
+        return self.is_stable(value[0])
+
     def partition(self, key):
         """ 
         Partition our key-space into n partitions.
-        Since we're dealing with integer keys (addresses), this is easy.
+        Since we're dealing with integer keys (addresses), this is a binary
+        search over the partition boundaries.
         """
         node = Node.serializer.deserialize((key, None))
-        return int((float(node.address) / 
-                    self.network.address_space) * self.options.partitions)
+        return self.range_partitioner(node.address)
 
     def mapper(self, key, value):
         # If a node is infected, check its hit list for a target 
         #      (otherwise choose randomly).
         #   Then, mark that node as INFECTING.
         # Otherwise, do nothing.
-        node = Node.serializer.deserialize((key, value))
-        if node.status == InfectionStatus.INFECTED:
+        # Only infected nodes are decoded (value is an EncodedNodeValue)
+        status = value.status
+        if status == InfectionStatus.INFECTED:
+            node = Node.serializer.deserialize((key, value.decode()))
             # Only infect if we're not delayed
             if node.propagation_delay == 0:
                 # Pick from our hit list first; if none exists, choose randomly
-                if any(node.hit_list):
-                    target = Node(node.hit_list.pop(), 
-                                  InfectionStatus.INFECTING, 
-                                  [], self.options.propagation_delay, 
-                                  node.address)
-                else:
-                    target = self.network.random_node(node.address, 
-                                             InfectionStatus.INFECTING, 
-                                             self.options.propagation_delay)
-                # Give the last half of our hit list to the newly-infected node
-                target.hit_list = node.hit_list[len(node.hit_list)/2:]
-
-                yield Node.serializer.serialize(target)
+                # (and give part of our hit list to each target)
+                for target in self.scan(node):
+                    yield target
             else:
                 node.propagation_delay -= 1
             #yield Node.serializer.serialize(node)
-        elif node.status == InfectionStatus.SUCCESSFUL:
+        elif status == InfectionStatus.SUCCESSFUL or \
+                status == InfectionStatus.HANDOFF:
             yield key, value
 
-    @staticmethod
-    def resolve_hit_list(statuses, nodes):
-        """ Utility method to resolve a node's hit list during reduction """
-        # Establish the "best" hit list as the longest list available
-        hit_list = reduce(lambda a,n: a if len(a) > len(n.hit_list) \
-                                       else n.hit_list, nodes, [])
-        # If we've just successfully infected someone, cut our list in half
-        #    (we sent it to the newly-infected node)
-        # Otherwise we're good.
-        if(any(imap(lambda status: status == InfectionStatus.SUCCESSFUL, 
-               statuses))):
-            return hit_list[:len(hit_list)/2]
-        else:
-            return hit_list
-        
-    def resolve_delay(self, statuses, nodes):
-        """" Resolve the delays that might be present amongst multiple edges"""
-        existing_delay = max(imap(lambda n: n.propagation_delay, nodes))  
-
-        # If the node is associated with a sccessful-infection edge,
-        # Make sure we return a delay that is at least as large as the
-        # network propagation delay
-        if(any(imap(lambda status: status == InfectionStatus.SUCCESSFUL, 
-               statuses))):
-            return max(existing_delay, self.options.propagation_delay)
-        # Otherwise just return the existing delay
+    def advance(self, node):
+        """
+        Applies the changes the mapper makes to an infected node, which are
+        not shuffled: a delayed node counts down, and otherwise the targets
+        of its scans are taken from the end of its hit list (see scan).
+        """
+        if node.propagation_delay == 0:
+            node.hit_list = node.hit_list[:len(node.hit_list) - min(
+                self.options.scans_per_iteration, len(node.hit_list))]
         else:
-            return existing_delay
-        
+            node.propagation_delay -= 1
+
     def reducer(self, key, values):
         # Each address (key) will have a set of infection statuses associated 
         #     therewith.
-        # For each such status, call InfectionStatus.compare and aggregate the 
-        #     response.
-        # Since we have a total order on these status values, reduce order does 
+        # Fold these records as they stream past (via NodeAccumulator), 
+        #     keeping only the running status, longest hit list, largest 
+        #     delay and source; memory is constant regardless of fan-in.
+        # Since we have a total order on these status values, reduce order does
         #     not matter.
+        # Transient edges are transmitted as they pass (if so configured).
         # Emit the final status value (and other node metadata)
-        candidate_nodes = map(Node.serializer.deserialize, 
-                              izip(repeat(key), values))
-        candidate_statuses = map(lambda n: n.status, candidate_nodes)
-        result_status = reduce(InfectionStatus.compare, candidate_statuses, 
-                               None)
+        # Nodes are joined from the partition file rather than shuffled, so
+        #     the mapper's changes to infected nodes are applied here.
+        fold = NodeAccumulator()
+        for node in imap(Node.serializer.deserialize, 
+                         izip(repeat(key), values)):
+            if node.status == InfectionStatus.INFECTED:
+                self.advance(node)
+            fold.add(node)
+            if self.is_volatile(node.status):
+                yield Node.serializer.serialize(node)
 
         # Only emit if it's an interesting status, otherwise ignore
-        if(self.is_stable(result_status)):
-            # Package the node into its current status and other metadata
-            result_node = \
-                Node(candidate_nodes[0].address, result_status, 
-                     hit_list=Propagate.resolve_hit_list(candidate_statuses, 
-                                                         candidate_nodes),
-                     propagation_delay=self.resolve_delay(candidate_statuses, 
-                                                          candidate_nodes),
-                     source=max(imap(lambda n: n.source, candidate_nodes)))
-            yield Node.serializer.serialize(result_node)
-
-            # If this is a new infection, send a back-link edge to the 
-            # attacking node (a SUCCESSFUL edge)
-            if(Propagate.is_new_infection(result_status, candidate_statuses)):
-                # Addresses are swapped for successful infections
-                yield Node.serializer.serialize(\
-                    Node(result_node.source, InfectionStatus.SUCCESSFUL, 
-                         source=result_node.address))
-
-        # Are we configured to transmit transient edges?  If so, do that now.            
-        if self.options.emit_volatile:
-            for volatile_node in filter(lambda n: self.is_volatile(n.status), 
-                                         candidate_nodes):
-                yield Node.serializer.serialize(volatile_node)
+        if(self.is_stable(fold.status)):
+            # Emit the node (along with any edges it gives rise to)
+            for pair in self.resolve(fold):
+                yield pair
 
 if __name__ == '__main__':
     """ Propogate an input network in time for a given number of iterations. """
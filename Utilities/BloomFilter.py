@@ -0,0 +1,114 @@
+import math
+from itertools import imap, ifilter
+import numpy
+from Network.Node import TabSeparatedNodeSerializer
+from Network.InfectionStatus import InfectionStatus
+from Utilities.Hashing import Hashing
+
+class BloomFilter:
+    """
+    A Bloom filter over network addresses.
+
+    Membership tests never produce false negatives, and produce false
+    positives with (approximately) the configured error rate.  Addresses are
+    hashed via double hashing over a 64-bit mixing function (see Hashing).
+    Both scalar (for use in mappers) and vectorized (for construction) paths
+    compute identical hashes.
+    """
+
+    seed = 0x9e3779b97f4a7c15
+
+    def __init__(self, bit_count, hash_count, bits=None):
+        self.bit_count = bit_count
+        self.hash_count = hash_count
+        self.bits = bits if not bits is None else \
+            numpy.zeros((bit_count + 7) / 8, dtype=numpy.uint8)
+
+    @staticmethod
+    def create(capacity, error_rate=0.01):
+        """ Creates a filter sized for the given capacity and error rate """
+        capacity = max(capacity, 1)
+        bit_count = int(math.ceil(-capacity * math.log(error_rate) /
+                                  math.log(2)**2))
+        hash_count = max(1, int(round(float(bit_count) / capacity *
+                                      math.log(2))))
+        return BloomFilter(bit_count, hash_count)
+
+    @staticmethod
+    def from_addresses(addresses, error_rate=0.01):
+        """ Creates a filter containing the given array of addresses """
+        bloom_filter = BloomFilter.create(len(addresses), error_rate)
+        bloom_filter.add(addresses)
+        return bloom_filter
+
+    @staticmethod
+    def from_network_file(filename, error_rate=0.01):
+        """
+        Creates a filter containing the address of every node in the given
+        (tab-separated) network file.  Transient records (SUCCESSFUL and
+        INFECTING edges) are ignored.
+        """
+        return BloomFilter.from_addresses(
+            BloomFilter.network_addresses(filename), error_rate)
+
+    @staticmethod
+    def network_addresses(filename):
+        """ Gets an array of the node addresses in a network file """
+        with open(filename) as stream:
+            return numpy.array([node.address for node in
+                            imap(TabSeparatedNodeSerializer.deserialize,
+                                 ifilter(lambda line: line.strip(), stream))
+                            if node.status != InfectionStatus.SUCCESSFUL and
+                               node.status != InfectionStatus.INFECTING],
+                        dtype=object)
+
+    def add(self, addresses):
+        """ Adds an array of addresses to this filter """
+        for index in self._indexes(addresses):
+            numpy.bitwise_or.at(self.bits,
+                (index >> numpy.uint64(3)).astype(numpy.intp),
+                numpy.left_shift(numpy.uint8(1),
+                                 (index & numpy.uint64(7)).astype(numpy.uint8)))
+
+    def __contains__(self, address):
+        """ Tests whether an address (possibly) belongs to this filter """
+        first, second = self._hashes(address)
+        for _ in xrange(self.hash_count):
+            index = first % self.bit_count
+            if not (self.bits[index >> 3] >> (index & 7)) & 1:
+                return False
+            first = (first + second) & Hashing.mask
+        return True
+
+    def save(self, filename):
+        """ Writes this filter to the given file """
+        with open(filename, 'wb') as stream:
+            numpy.array([self.bit_count, self.hash_count],
+                        dtype='<u8').tofile(stream)
+            self.bits.tofile(stream)
+
+    @staticmethod
+    def load(filename):
+        """ Reads a filter previously written via save """
+        with open(filename, 'rb') as stream:
+            bit_count, hash_count = numpy.fromfile(stream, '<u8', 2)
+            return BloomFilter(int(bit_count), int(hash_count),
+                               numpy.fromfile(stream, numpy.uint8))
+
+    @staticmethod
+    def _hashes(address):
+        """ Computes the pair of base hashes for a single address """
+        key = Hashing.fold(address)
+        return Hashing.mix(key), Hashing.mix(key ^ BloomFilter.seed) | 1
+
+    def _indexes(self, addresses):
+        """ Generates an array of bit indexes for each hash function """
+        keys = Hashing.fold_array(numpy.asarray(addresses, dtype=object))
+        first = Hashing.mix_array(keys)
+        second = Hashing.mix_array(keys ^ numpy.uint64(BloomFilter.seed)) \
+                 | numpy.uint64(1)
+
+        for _ in xrange(self.hash_count):
+            yield first % numpy.uint64(self.bit_count)
+            with numpy.errstate(over='ignore'):
+                first = first + second
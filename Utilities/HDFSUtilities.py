@@ -1,8 +1,7 @@
-import os
 import subprocess
-import re
+from Storage import Storage
 
-class HDFSUtilities:
+class HDFSUtilities(Storage):
     """
     Utility class exposing HDFS operations.  Assumes that the hadoop 
     executable is part of the current path.
@@ -17,31 +16,21 @@ class HDFSUtilities:
         return HDFSUtilities.__exec(["hadoop", "dfs", "-lsr", path])
 
     @staticmethod
-    def download_file(uri, local_directory):
+    def download_file(uri, local_filename):
         """ Moves a file from the HDFS to local storage """ 
         return HDFSUtilities.__exec(["hadoop", "dfs", "-copyToLocal", 
-                                     uri, local_directory])
+                                     uri, local_filename])
 
     @staticmethod
-    def download_files(filenames, local_directory, create_directory=True):
-        """ Moves a list of files from the HDFS to local storage """
-        # Create the destination directory if requested
-        if create_directory and not os.path.exists(local_directory): 
-            os.mkdir(local_directory)
-        # For each file, download it.
-        map(lambda filename: HDFSUtilities.download_file(
-                filename, 
-                HDFSUtilities._make_local_filename(filename, local_directory)),
-            filenames)
+    def upload_file(local_filename, uri):
+        """ Moves a file from local storage to the HDFS """
+        return HDFSUtilities.__exec(["hadoop", "dfs", "-put", 
+                                     local_filename, uri])
 
     @staticmethod
-    def _make_local_filename(uri, local_directory):
-        """ Given a HDFS URI, convert it into a local filename. """
-        pattern = '.*/(?P<filename>[^/]+)$'
-        local_filename = re.search(pattern, uri)
-        separator = '/' if not local_directory.endswith('/') else ''
-        return local_directory + separator + local_filename.group(1) \
-                    if not local_filename is None else None
+    def read_files(uris):
+        """ Gets the concatenated contents of a list of files on the HDFS """
+        return HDFSUtilities.__exec(["hadoop", "dfs", "-cat"] + list(uris))
 
     @staticmethod
     def __exec(arguments):
@@ -0,0 +1,47 @@
+import numpy
+
+class Hashing:
+    """
+    64-bit hashing of network addresses.
+
+    Provides a mixing function (the SplitMix64 finalizer) in both scalar and
+    vectorized form; the two compute identical results.  Addresses wider
+    than 64 bits are first folded into 64 bits.
+    """
+
+    mask = 2**64 - 1
+
+    @staticmethod
+    def mix(value):
+        """ Mixes a single 64-bit value """
+        value ^= value >> 30
+        value = (value * 0xbf58476d1ce4e5b9) & Hashing.mask
+        value ^= value >> 27
+        value = (value * 0x94d049bb133111eb) & Hashing.mask
+        return value ^ (value >> 31)
+
+    @staticmethod
+    def mix_array(values):
+        """ Vectorized equivalent of mix over an array of uint64 values """
+        with numpy.errstate(over='ignore'):
+            values = values ^ (values >> numpy.uint64(30))
+            values = values * numpy.uint64(0xbf58476d1ce4e5b9)
+            values = values ^ (values >> numpy.uint64(27))
+            values = values * numpy.uint64(0x94d049bb133111eb)
+            return values ^ (values >> numpy.uint64(31))
+
+    @staticmethod
+    def fold(address):
+        """ Folds a single address into 64 bits """
+        return (address & Hashing.mask) ^ Hashing.mix(address >> 64)
+
+    @staticmethod
+    def fold_array(addresses):
+        """ Vectorized equivalent of fold over an array of addresses """
+        addresses = numpy.asarray(addresses)
+        # Since mix(0) is zero, narrow addresses are unchanged
+        if addresses.dtype == numpy.uint64:
+            return addresses
+        addresses = addresses.astype(object)
+        return (addresses & Hashing.mask).astype(numpy.uint64) ^ \
+               Hashing.mix_array((addresses >> 64).astype(numpy.uint64))
@@ -0,0 +1,48 @@
+import os
+import shutil
+from Storage import Storage
+
+class LocalFileSystem(Storage):
+    """
+    Local stand-in for HDFSUtilities, exposing the same operations over a
+    directory on the local file system.  Used to run Schimmy jobs without
+    Hadoop (see SchimmyMRJob.use_local_partitions).
+    """
+
+    @staticmethod
+    def list_files(path):
+        """
+        Generates a list of files residing at the given path and recursively
+        including all subdirectories.  As with hadoop dfs -lsr, each line
+        holds a file's size followed by its (absolute) path.
+        """
+        return ''.join(' %d %s\n' % (os.path.getsize(filename), filename)
+                       for directory, _, filenames in
+                           os.walk(os.path.abspath(path))
+                       for filename in map(lambda name:
+                           os.path.join(directory, name), sorted(filenames)))
+
+    @staticmethod
+    def read_files(uris):
+        """ Gets the concatenated contents of a list of files """
+        return ''.join(map(lambda uri: open(uri).read(), uris))
+
+    @staticmethod
+    def upload_file(local_filename, uri):
+        """ Copies a file into the given location """
+        shutil.copyfile(local_filename, uri)
+
+    @staticmethod
+    def download_file(uri, local_filename):
+        """
+        Links a file into local storage (files are never modified).  A file
+        already at the local filename is replaced, unless it is a link to
+        the same file.
+        """
+        source = os.path.abspath(uri)
+        if os.path.islink(local_filename) and \
+                os.readlink(local_filename) == source:
+            return
+        elif os.path.lexists(local_filename):
+            os.remove(local_filename)
+        os.symlink(source, local_filename)
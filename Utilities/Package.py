@@ -11,7 +11,7 @@ class Package:
 
     @classmethod 
     def create(cls, archive_name=None, 
-                     directories=['.', 'Network', 'Utilities'], 
+                     directories=['.', 'Engine', 'Network', 'Utilities'], 
                     filetype='*.py'):
         """ Creates a new archive that includes the given files and 
             directories """
@@ -0,0 +1,84 @@
+import os
+import tempfile
+from itertools import imap
+
+class PartitionManifest:
+    """
+    Describes the partition files written by a Schimmy step.
+
+    Each Schimmy reducer writes its partition file (_partition-xxxxx, for
+    partition xxxxx) and a small manifest file (named _manifest-xxxxx)
+    alongside its output, the latter holding a single tab-separated line of
+    the form:
+
+        partition  filename  first-key  last-key  record-count
+
+    where the keys are '-' for an empty partition.  The manifest records
+    the partition file's name and key range, so a reducer in the following
+    step may look up its partition file directly.  A step is complete when
+    its manifests cover every partition exactly once.
+    """
+
+    filename_format = '_manifest-%05d'
+
+    def __init__(self, entries=()):
+        self.entries = {}
+        self.duplicated = False
+        for entry in entries:
+            self.duplicated |= entry[0] in self.entries
+            self.entries[entry[0]] = entry
+
+    def __len__(self):
+        return len(self.entries)
+
+    def filename(self, partition):
+        """ Gets the name of the file holding the given partition """
+        return self.entries[partition][1]
+
+    def is_complete(self, total_partitions):
+        """ Indicates whether every partition is described exactly once """
+        return not self.duplicated and \
+               set(self.entries) == set(xrange(total_partitions))
+
+    @staticmethod
+    def format_entry(partition, filename, first_key, last_key, count):
+        """ Formats a manifest entry as a line """
+        key = lambda key: '%d' % key if not key is None else '-'
+        return '%d\t%s\t%s\t%s\t%d\n' % (partition, filename, key(first_key),
+                                         key(last_key), count)
+
+    @staticmethod
+    def parse_entry(line):
+        """ Parses a manifest line into a (partition, filename, first-key,
+            last-key, count) tuple """
+        partition, filename, first_key, last_key, count = \
+            line.rstrip('\r\n').split('\t')
+        key = lambda key: int(key) if key != '-' else None
+        return int(partition), filename, key(first_key), key(last_key), \
+               int(count)
+
+    @staticmethod
+    def parse(text):
+        """ Parses the (concatenated) contents of one or more manifests """
+        return PartitionManifest(imap(PartitionManifest.parse_entry,
+            filter(lambda line: line.strip(), text.splitlines())))
+
+    @staticmethod
+    def write(directory, partition, filename, first_key, last_key, count,
+              uploader):
+        """
+        Writes the manifest for a partition to the given directory.  The
+        manifest is written locally and moved by the uploader, a function
+        from (local filename, destination filename).
+        """
+        handle, local_filename = tempfile.mkstemp()
+        try:
+            os.write(handle, PartitionManifest.format_entry(
+                partition, filename, first_key, last_key, count))
+        finally:
+            os.close(handle)
+        try:
+            uploader(local_filename, '%s/%s' % (directory,
+                PartitionManifest.filename_format % partition))
+        finally:
+            os.remove(local_filename)
@@ -1,75 +1,285 @@
 from sys import argv
 import tarfile
+import gzip
+import heapq
 import os
+import shutil
 import tempfile
-from itertools import repeat
-from Network.Node import TabSeparatedNodeSerializer
+import time
+import multiprocessing
+from itertools import imap
+from Utilities.RangePartitioner import RangePartitioner
 
 class Partitions:
     """
     Utility class that accepts a (potentially large) input file and emits
     n partitions that contain the sorted results based upon a given partition
     function.
+
+    Partitions are created via an external merge sort, so the input need not
+    fit in memory.  Lines are buffered until a memory budget is exhausted,
+    at which point the buffer is sorted (by partition and address) and
+    spilled to disk as a run.  Each partition is then produced by a k-way
+    merge of its segment of every run.  Partitions are merged and compressed
+    in parallel; each worker compresses its partitions as gzip members of the
+    final archive, which are concatenated (in partition order) to form a
+    single tar.gz file.
+
+    Partitions whose lines already arrive in address order (as from a sorted
+    input, such as that created by CreateVulnerableHosts) are not sorted
+    again.
+
+    When the partitioner is a RangePartitioner, its boundaries are stored in
+    the archive (as the boundaries file) so that they may be reloaded by
+    every task.
     """
-    @staticmethod 
-    def create(filename, partitions, partitioner, 
-                          fail_silently=False, tar_filename=None):
+
+    # The default memory budget (in bytes) of the sort buffer
+    memory_budget = 2**28
+    # The (approximate) per-line overhead of a buffered line, in bytes
+    line_overhead = 128
+    # The archive member holding the boundaries of a range partitioner
+    boundaries_filename = 'boundaries'
+
+    @staticmethod
+    def create(filename, partitions, partitioner,
+                          fail_silently=False, tar_filename=None,
+                          memory_budget=None, processes=None):
         """
         Create a new partition.
         filename: input filename
         partitions: the number of partitions to create
-        partitioner: a function from key to partition number
-        fail_silently: when set, will swallow any exception encountered when 
+        partitioner: a function from key to partition number (or a
+                     RangePartitioner, whose boundaries are also archived)
+        fail_silently: when set, will swallow any exception encountered when
                        opening the input file
         tar_filename: The filename used to create the partition archive
+                      (a temporary file, which the caller must remove, is
+                      created by default)
+        memory_budget: The (approximate) number of bytes of input buffered
+                       before a sorted run is spilled to disk
+        processes: The number of processes used to merge and compress
+                   partitions (defaults to the number of processors)
         """
-        make_filename = lambda partition: 'part-%05d' % partition
-        make_path = lambda partition: '%s/%s' % (directory, 
-                                                  make_filename(partition))
-        nodes = map(lambda _: [], xrange(partitions))
-        stream = None
-
         # Open the file, swallow if flag set
         try:
             stream = open(filename)
         except IOError:
             if not fail_silently: raise
             else: return None
-            
-        # For each line in the file, save it to its proper partition
-        try:
-            for line in stream:
-                node = TabSeparatedNodeSerializer.deserialize(line)
-                partition = partitioner(node.address)
-                nodes[partition].append(node)
-        finally:
-            if stream: stream.close()
 
-        # Create a temporary file
         directory = tempfile.mkdtemp()
-
-        # For each partition, write its dataset
-        for partition, partition_nodes in enumerate(nodes):
-            stream = open(make_path(partition), "w")
+        try:
             try:
-                for node in sorted(partition_nodes, key=lambda n: n.address):
-                    stream.write(\
-                        TabSeparatedNodeSerializer.serialize(node) + '\n')
+                runs, buffered = Partitions._spill(
+                    stream, partitions, partitioner, directory,
+                    memory_budget or Partitions.memory_budget)
             finally:
-                if stream: stream.close()
-        
-        # Compress the resulting partitions
-        tar_filename = tar_filename or tempfile.mktemp(prefix='partition', 
-                                                       suffix='.tar.gz')
-        tar = tarfile.open(tar_filename, "w:gz")
-        try: map(lambda p: tar.add(make_path(p), make_filename(p)), 
-                  xrange(partitions))
-        finally: tar.close()
-
-        # Remove the scratch files
-        map(lambda p: os.remove(make_path(p)), xrange(partitions))
+                stream.close()
+
+            # Compress the resulting partitions
+            if not tar_filename:
+                handle, tar_filename = tempfile.mkstemp(prefix='partition',
+                                                        suffix='.tar.gz')
+                os.close(handle)
+            members = Partitions._compress(runs, buffered, partitions,
+                directory, processes or multiprocessing.cpu_count())
+            if isinstance(partitioner, RangePartitioner):
+                path = '%s/%s' % (directory, Partitions.boundaries_filename)
+                Partitions._write_member([partitioner.dumps()],
+                                         Partitions.boundaries_filename, path)
+                members.append(path + '.gz')
+            Partitions._concatenate(tar_filename, members)
+        finally:
+            # Remove the scratch files
+            shutil.rmtree(directory, True)
 
         return tar_filename
 
+    @staticmethod
+    def _spill(stream, partitions, partitioner, directory, memory_budget):
+        """
+        Reads the input, spilling sorted runs to disk whenever the memory
+        budget is exhausted.  Returns the runs (as a filename and the offset
+        and length of each partition's segment) and the final buffer, which
+        is held in memory and treated as one last run.
+        """
+        runs = []
+        buffered = []
+        size = 0
+        # The last address seen in each partition, if still in order
+        last = [None] * partitions
+        unsorted = False
+
+        for line in stream:
+            if not line.strip():
+                continue
+            if not line.endswith('\n'):
+                line += '\n'
+            address = Partitions._address(line)
+            partition = partitioner(address)
+            if last[partition] > address:
+                unsorted = True
+            last[partition] = address
+            buffered.append((partition, address, line))
+            size += len(line) + Partitions.line_overhead
+
+            if size >= memory_budget:
+                runs.append(Partitions._write_run(
+                    Partitions._sort(buffered, unsorted), partitions,
+                    '%s/run-%05d' % (directory, len(runs))))
+                buffered, size, unsorted = [], 0, False
+                last = [None] * partitions
+
+        return runs, Partitions._segments(
+                         Partitions._sort(buffered, unsorted), partitions)
+
+    @staticmethod
+    def _address(line):
+        """ Extracts the address (the leading key) of a serialized node """
+        return int(line.split('\t', 1)[0])
+
+    @staticmethod
+    def _sort(buffered, unsorted):
+        """
+        Orders a buffer by partition and address.  A buffer whose partitions
+        are each already in order need only be (stably) grouped by partition.
+        """
+        if unsorted:
+            buffered.sort()
+        else:
+            buffered.sort(key=lambda (partition, _, __): partition)
+        return buffered
+
+    @staticmethod
+    def _segments(buffered, partitions):
+        """ Divides a sorted buffer into a list of lines per partition """
+        segments = map(lambda _: [], xrange(partitions))
+        for partition, _, line in buffered:
+            segments[partition].append(line)
+        return segments
+
+    @staticmethod
+    def _write_run(buffered, partitions, filename):
+        """ Writes a sorted buffer to disk as a run """
+        segments = [(0, 0)] * partitions
+        stream = open(filename, 'w')
+        try:
+            for partition, lines in enumerate(
+                    Partitions._segments(buffered, partitions)):
+                segments[partition] = (stream.tell(), len(lines))
+                stream.writelines(lines)
+        finally:
+            stream.close()
+        return filename, segments
+
+    @staticmethod
+    def _read_run(run, partition):
+        """ Generates the lines of a partition's segment of a run """
+        filename, segments = run
+        offset, length = segments[partition]
+        if not length:
+            return
+        stream = open(filename)
+        try:
+            stream.seek(offset)
+            for _ in xrange(length):
+                yield stream.readline()
+        finally:
+            stream.close()
+
+    @staticmethod
+    def _merge(runs, buffered, partition):
+        """ Generates the lines of a partition in address order """
+        sources = map(lambda run: Partitions._read_run(run, partition), runs)
+        sources.append(iter(buffered[partition]))
+        if len(runs) == 0:
+            return sources[0]
+        return imap(lambda (_, line): line, heapq.merge(*map(
+            lambda source: imap(lambda line: (Partitions._address(line),
+                                              line), source),
+            sources)))
+
+    @staticmethod
+    def _compress(runs, buffered, partitions, directory, processes):
+        """
+        Merges and compresses each partition (in parallel), and returns the
+        filenames of the compressed archive members in partition order
+        """
+        processes = max(1, min(processes, partitions))
+        workers = map(lambda worker: multiprocessing.Process(
+                          target=Partitions._work,
+                          args=(worker, processes, runs, buffered,
+                                partitions, directory)),
+                      xrange(processes))
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if any(imap(lambda worker: worker.exitcode, workers)):
+            raise RuntimeError('A partition worker failed.')
+
+        return map(lambda partition: '%s/part-%05d.gz' %
+                                         (directory, partition),
+                   xrange(partitions))
+
+    @staticmethod
+    def _work(worker, processes, runs, buffered, partitions, directory):
+        """ Compresses every partition assigned to a worker process """
+        for partition in xrange(worker, partitions, processes):
+            Partitions._write_member(
+                Partitions._merge(runs, buffered, partition),
+                'part-%05d' % partition,
+                '%s/part-%05d' % (directory, partition))
+
+    @staticmethod
+    def _write_member(lines, name, path):
+        """
+        Writes a partition to disk, then compresses it as a tar entry (without
+        an end-of-archive marker) in a gzip member of its own
+        """
+        stream = open(path, 'w')
+        try:
+            stream.writelines(lines)
+        finally:
+            stream.close()
+
+        info = tarfile.TarInfo(name)
+        info.size = os.path.getsize(path)
+        info.mtime = time.time()
+        member = gzip.open(path + '.gz', 'wb')
+        stream = open(path)
+        try:
+            member.write(info.tobuf(tarfile.GNU_FORMAT))
+            shutil.copyfileobj(stream, member)
+            member.write(tarfile.NUL * (-info.size % tarfile.BLOCKSIZE))
+        finally:
+            stream.close()
+            member.close()
+        os.remove(path)
+
+    @staticmethod
+    def _concatenate(tar_filename, members):
+        """
+        Concatenates compressed tar entries (and an end-of-archive marker)
+        into a tar.gz archive; a series of gzip members is itself valid gzip
+        """
+        archive = open(tar_filename, 'wb')
+        try:
+            for member in members:
+                stream = open(member, 'rb')
+                try: shutil.copyfileobj(stream, archive)
+                finally: stream.close()
+            marker = gzip.GzipFile(fileobj=archive, mode='wb')
+            marker.write(tarfile.NUL * tarfile.BLOCKSIZE * 2)
+            marker.close()
+        finally:
+            archive.close()
+
 if __name__ == '__main__':
-    CreatePartitions.create(argv[1], int(argv[2]))
+    # Argv[1] specifies the input, argv[2] the number of (range) partitions
+    # and argv[3] the network class name (see Network.Network)
+    import Network.Network
+    network = getattr(Network.Network, argv[3])
+    print Partitions.create(argv[1], int(argv[2]),
+        lambda address: network.partition(address, int(argv[2])))
@@ -0,0 +1,349 @@
+import os
+import shutil
+import tempfile
+import numpy
+from Network.InfectionStatus import InfectionStatus
+from Network.Node import Node
+from Network.NodeAccumulator import NodeAccumulator
+from Network.ScanStrategy import ScanStrategy
+from Utilities.BloomFilter import BloomFilter
+from Utilities.VulnerableStore import VulnerableStore
+
+class PropagationJob(object):
+    """
+    Mixin holding the map and combine logic shared by the propagation jobs
+    (Propagate.py and SchimmyPropagate.py), along with the resolution of a
+    reducer's folded records.  It precedes the job's MRJob base class:
+
+        class Propagate(PropagationJob, MRJob): ...
+
+    Jobs define their own mapper and reducer (which differ in whether
+    stable nodes are shuffled), and are expected to set self.network.
+
+    Files created for a run (see temporary_file and temporary_directory)
+    are removed once the job has run.  Files shipped to tasks (see
+    upload_file) are read from the driver-side path by runners that do not
+    materialize uploads (such as the inline runner, whose tasks run in the
+    driver's process).
+    """
+
+    bloom_filter_filename = 'network.bloom'
+    # The number of infected nodes whose scans are generated together
+    scan_batch_size = 4096
+    # Driver-side paths of the files shipped to tasks, by uploaded name
+    uploaded_files = {}
+
+    def add_propagation_options(self):
+        """ Adds the options common to the propagation jobs """
+        self.add_passthrough_option(
+            '--network', type='string',
+            help='Indicate the class name of the network associated with '+\
+                  'this propagation, one of { IPv4, IPv6, Network256, '+\
+                  'NetworkGraphable }.')
+        self.add_passthrough_option(
+            '--iterations', type='int', default=1,
+            help='Indicate the number of iterations to execute.')
+        self.add_passthrough_option(
+            '--scans-per-iteration', type='int', default=1,
+            help='Indicate the number of scans made by each infected node '+\
+                  'during an iteration.')
+        self.add_passthrough_option(
+            '--scan-strategy', type='choice', default='uniform',
+            choices=sorted(ScanStrategy.strategies),
+            help='Indicate how random scans select their targets, one of '+\
+                  '{ uniform, local-subnet, permutation }.')
+        self.add_passthrough_option(
+            '--seed', type='int', default=None,
+            help='Indicate the random seed used to select targets.')
+        self.add_passthrough_option(
+            '--propagation-delay', type='int', default=0,
+            help='Indicate the propagation delay for new infections.')
+        self.add_passthrough_option(
+            '--emit-volatile', type='int', default=0,
+            help='Indicate whether to emit infecting edges from the last '+\
+                  'iteration.')
+        self.add_passthrough_option(
+            '--defer-hit-lists', type='int', default=0,
+            help='Indicate whether hit lists are handed to newly-infected '+\
+                  'nodes only once an infection succeeds (rather than '+\
+                  'attached to every infection attempt).')
+        self.add_passthrough_option(
+            '--bloom-filter', type='int', default=0,
+            help='Indicate whether to drop infection attempts against '+\
+                  'addresses outside of the network before they are '+\
+                  'shuffled (missed attempts are counted instead).')
+
+    def is_volatile(self, status):
+        """ Indicates if a node is volatile, and expected to change between
+            iterations (or is transient in nature) """
+        return (self.options.emit_volatile and \
+                 status == InfectionStatus.INFECTING)
+
+    def is_stable(self, status):
+        """
+        Identifies if a node should be emitted by the mapper
+        Some states (such as INFECTING) MAY NOT need to be carried forward.
+        """
+        return (status == InfectionStatus.VULNERABLE or
+                 status == InfectionStatus.INFECTED or
+                 status == InfectionStatus.IMMUNE)
+
+    @property
+    def temporary_paths(self):
+        """ The files (and directories) to remove once the job has run """
+        if "_temporary_paths" not in self.__dict__:
+            self._temporary_paths = []
+        return self._temporary_paths
+
+    def temporary_file(self, suffix=''):
+        """ Creates an empty file that is removed once the job has run """
+        handle, filename = tempfile.mkstemp(suffix=suffix)
+        os.close(handle)
+        self.temporary_paths.append(filename)
+        return filename
+
+    def temporary_directory(self):
+        """ Creates a directory that is removed once the job has run """
+        directory = tempfile.mkdtemp()
+        self.temporary_paths.append(directory)
+        return directory
+
+    def run_job(self):
+        try:
+            super(PropagationJob, self).run_job()
+        finally:
+            for path in self.temporary_paths:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                elif os.path.exists(path):
+                    os.remove(path)
+
+    def upload_file(self, path, name):
+        """ Ships a (driver-side) file to tasks under the given name """
+        self.options.upload_files.append('%s#%s' % (path, name))
+        PropagationJob.uploaded_files[name] = path
+
+    def uploaded_file(self, name):
+        """
+        Locates a file shipped to tasks (see upload_file); if no file of
+        that name was materialized, the driver-side path is used instead
+        """
+        return name if os.path.exists(name) else \
+               PropagationJob.uploaded_files.get(name, name)
+
+    def create_bloom_filter(self, filenames, store_filename=None):
+        """
+        Creates a filter of the addresses in the given network files (and
+        vulnerable store, if any), and ships it to our mappers
+        """
+        addresses = numpy.concatenate(
+            map(BloomFilter.network_addresses, filenames) +
+            ([VulnerableStore.load(store_filename).state.addresses\
+                  .astype(object)] if store_filename else []))
+
+        bloom_filter_filename = self.temporary_file(suffix='.bloom')
+        BloomFilter.from_addresses(addresses).save(bloom_filter_filename)
+        self.upload_file(bloom_filter_filename,
+                         PropagationJob.bloom_filter_filename)
+
+    def is_missed(self, target):
+        """
+        Identifies infection attempts that are guaranteed to miss (since
+        the target is not part of the network).  Requires a Bloom filter.
+        """
+        return self.options.bloom_filter and \
+                not target.address in self.bloom_filter
+
+    def pick_protocols(self, step_num, step_type):
+        """
+        Mappers and combiners read node metadata left encoded (see
+        EncodedNodeValue), so that only the records they act upon are
+        decoded; all other records are passed through as they were read.
+        """
+        read, write = super(PropagationJob, self).pick_protocols(step_num,
+                                                                 step_type)
+        if step_type == 'M':
+            protocol = self.input_protocol() if step_num == 0 else \
+                       self.internal_protocol()
+            read = protocol.read_encoded
+        elif step_type == 'C':
+            read = self.internal_protocol().read_encoded
+        return read, write
+
+    def mapper_init(self):
+        self.scans = []
+        self.scan_strategy = ScanStrategy.create(self.options.scan_strategy,
+                                                 self.network,
+                                                 self.options.seed)
+        if self.options.bloom_filter:
+            self.bloom_filter = BloomFilter.load(
+                self.uploaded_file(PropagationJob.bloom_filter_filename))
+
+    def mapper_final(self):
+        # Generate the targets of any scans still queued
+        return self.flush_scans()
+
+    def scan(self, node):
+        """
+        Queues an infected node's scans for this iteration (one per
+        scans-per-iteration).  Addresses are taken from the end of the
+        node's hit list first, and the rest are selected by the scan
+        strategy.  Unless hit lists are deferred, the last half of the hit
+        list that remains is divided evenly between the targets.  Targets
+        are generated (by flush_scans) once a batch of nodes is queued.
+        """
+        addresses = [node.hit_list.pop()
+                     for _ in xrange(min(self.options.scans_per_iteration,
+                                         len(node.hit_list)))]
+        donation = node.hit_list[len(node.hit_list)/2:] \
+            if not self.options.defer_hit_lists else []
+        self.scans.append((node.address, addresses, donation))
+
+        if len(self.scans) >= self.scan_batch_size:
+            return self.flush_scans()
+        return iter([])
+
+    def flush_scans(self):
+        """
+        Generates the targets of the queued scans; the scan strategy selects
+        the random targets of every queued node in a single call
+        """
+        scans = self.options.scans_per_iteration
+        queued, self.scans = self.scans, []
+        if not queued: return
+
+        targets = self.scan_strategy.targets(
+            map(lambda (source, _, __): source, queued), scans,
+            self.options.step_num)
+        for row, (source, addresses, donation) in enumerate(queued):
+            addresses += targets[row * scans:
+                                 (row + 1) * scans - len(addresses)].tolist()
+            for index, address in enumerate(addresses):
+                target = Node(address, InfectionStatus.INFECTING,
+                              donation[index * len(donation) / scans:
+                                       (index + 1) * len(donation) / scans],
+                              self.options.propagation_delay, source)
+                # Drop attempts that are guaranteed to miss (but count them)
+                if self.is_missed(target):
+                    self.increment_counter('Propagate', 'Missed scans')
+                else:
+                    yield Node.serializer.serialize(target)
+
+    @staticmethod
+    def resolve_hit_list(fold):
+        """ Utility method to resolve a node's hit list during reduction """
+        # The "best" hit list is the longest list available
+        # If we've just successfully infected someone, cut our list in half
+        #    (we sent it to the newly-infected node)
+        # Otherwise we're good.
+        if fold.has_status(InfectionStatus.SUCCESSFUL):
+            return fold.hit_list[:len(fold.hit_list)/2]
+        else:
+            return fold.hit_list
+
+    @staticmethod
+    def hand_off_hit_list(fold):
+        """
+        Utility method to resolve a node's hit list during reduction when hit
+        lists are deferred.  The last half of the (longest) hit list is split
+        off for each node newly infected by this one; returns the hit list
+        that remains, along with the HANDOFF edges carrying the rest.
+        """
+        hit_list = fold.hit_list
+        handoffs = []
+        for victim in fold.successful:
+            if hit_list:
+                handoffs.append(Node(victim, InfectionStatus.HANDOFF,
+                                     hit_list[len(hit_list)/2:],
+                                     source=fold.address))
+            hit_list = hit_list[:len(hit_list)/2]
+        return hit_list, handoffs
+
+    def resolve_delay(self, fold):
+        """" Resolve the delays that might be present amongst multiple edges"""
+        # If the node is associated with a sccessful-infection edge,
+        # Make sure we return a delay that is at least as large as the
+        # network propagation delay
+        if fold.has_status(InfectionStatus.SUCCESSFUL):
+            return max(fold.propagation_delay, self.options.propagation_delay)
+        # Otherwise just return the existing delay
+        else:
+            return fold.propagation_delay
+
+    def resolve(self, fold):
+        """
+        Generates the records a reducer emits for an address whose fold has
+        a stable status: the node itself, a SUCCESSFUL edge back to its
+        attacker (if it was newly infected), and any hit-list handoffs.
+        """
+        # Resolve the hit list, handing part of it to any nodes newly
+        # infected by this one (if deferred)
+        if self.options.defer_hit_lists:
+            hit_list, handoffs = PropagationJob.hand_off_hit_list(fold)
+        else:
+            hit_list, handoffs = PropagationJob.resolve_hit_list(fold), []
+
+        # Package the node into its current status and other metadata
+        result_node = fold.node(hit_list=hit_list,
+                                propagation_delay=self.resolve_delay(fold))
+        yield Node.serializer.serialize(result_node)
+
+        # If this is a new infection, send a back-link edge to the
+        # attacking node (a SUCCESSFUL edge)
+        if fold.is_new_infection():
+            # Addresses are swapped for successful infections
+            yield Node.serializer.serialize(\
+                Node(result_node.source, InfectionStatus.SUCCESSFUL,
+                     source=result_node.address))
+
+        for handoff in handoffs:
+            yield Node.serializer.serialize(handoff)
+
+    def combiner_group(self, node):
+        """
+        Identifies the transient records that the combiner may fold together:
+        those sharing a status (and, when volatile edges are emitted, a
+        source, so that every infecting edge survives).  When hit lists are
+        deferred, each successful edge carries its own handoff, so these are
+        grouped by source as well.
+        """
+        return (node.status,
+                node.source if self.is_volatile(node.status) or \
+                               (self.options.defer_hit_lists and
+                                node.status == InfectionStatus.SUCCESSFUL) \
+                            else None)
+
+    def combiner_init(self):
+        self.records_in, self.records_out = 0, 0
+
+    def combiner_final(self):
+        # Track combiner efficiency (reported once per task)
+        self.increment_counter('Combiner', 'Records in', self.records_in)
+        self.increment_counter('Combiner', 'Records out', self.records_out)
+
+    def combiner(self, key, values):
+        # Stable nodes are passed through untouched (without decoding).
+        # Transient records (INFECTING, SUCCESSFUL and HANDOFF) in the same
+        #     combiner group are folded into a single record using the
+        #     reducer's own resolution (longest hit list, largest delay and
+        #     source).  Since statuses are preserved, the reducer sees the
+        #     same result status and detects new infections exactly as before.
+        groups = {}
+        for value in values:
+            self.records_in += 1
+            if self.is_stable(value.status):
+                self.records_out += 1
+                yield key, value
+            else:
+                node = Node.serializer.deserialize((key, value.decode()))
+                group = self.combiner_group(node)
+                if not group in groups:
+                    groups[group] = NodeAccumulator()
+                groups[group].add(node)
+
+        for (status, _), fold in groups.iteritems():
+            yield Node.serializer.serialize(
+                fold.node(status,
+                          hit_list=PropagationJob.resolve_hit_list(fold),
+                          propagation_delay=self.resolve_delay(fold)))
+            self.records_out += 1
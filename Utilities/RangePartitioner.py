@@ -0,0 +1,115 @@
+import os
+import random
+from itertools import imap
+from bisect import bisect_right
+
+class RangePartitioner:
+    """
+    Partitions addresses into contiguous ranges delimited by integer boundary
+    keys.  Partition i holds the addresses in [boundaries[i-1], boundaries[i])
+    and keys are assigned by binary search, so assignment is exact even for
+    128-bit addresses.
+
+    Boundaries are chosen as the quantiles of a sample of the input, so that
+    each partition (and therefore each Schimmy reducer) receives roughly the
+    same number of nodes even when vulnerable hosts cluster.  They are stored
+    alongside the partition files (see Partitions.create) so that every task
+    assigns keys identically.
+    """
+
+    # The number of addresses sampled for each partition
+    samples_per_partition = 1024
+    # Inputs with fewer bytes per sample than this are read in full
+    bytes_per_sample = 256
+
+    def __init__(self, boundaries):
+        self.boundaries = list(boundaries)
+
+    def __call__(self, address):
+        return bisect_right(self.boundaries, address)
+
+    def __len__(self):
+        return len(self.boundaries) + 1
+
+    @staticmethod
+    def equal(address_space, partitions):
+        """
+        Creates a partitioner over n equally-sized address ranges (those of
+        Network.partition)
+        """
+        return RangePartitioner(imap(
+            lambda partition: -(-partition * address_space // partitions),
+            xrange(1, partitions)))
+
+    @staticmethod
+    def from_sample(addresses, partitions):
+        """ Creates a partitioner from the quantiles of a sample """
+        addresses = sorted(addresses)
+        return RangePartitioner(imap(
+            lambda partition: addresses[partition * len(addresses) //
+                                        partitions],
+            xrange(1, partitions)))
+
+    @staticmethod
+    def from_network_file(filename, partitions, address_space):
+        """
+        Creates a partitioner balanced for the nodes in the given network
+        file.  Lines are sampled at random offsets (so that large inputs
+        need not be read in full); if the input is empty, the address space
+        is divided into equal ranges.
+        """
+        sample_size = partitions * RangePartitioner.samples_per_partition
+        size = os.path.getsize(filename)
+        stream = open(filename)
+        try:
+            if size <= sample_size * RangePartitioner.bytes_per_sample:
+                addresses = map(RangePartitioner._address,
+                                filter(lambda line: line.strip(), stream))
+            else:
+                addresses = filter(lambda address: not address is None,
+                    imap(lambda _: RangePartitioner._address_at(
+                                       stream, random.randrange(size)),
+                         xrange(sample_size)))
+        finally:
+            stream.close()
+
+        return RangePartitioner.from_sample(addresses, partitions) \
+               if addresses else \
+               RangePartitioner.equal(address_space, partitions)
+
+    @staticmethod
+    def _address(line):
+        """ Extracts the address (the leading key) of a serialized node """
+        return int(line.split('\t', 1)[0])
+
+    @staticmethod
+    def _address_at(stream, offset):
+        """
+        Gets the address of the first line starting after the given offset,
+        wrapping around to the first line at the end of the input
+        """
+        stream.seek(offset)
+        stream.readline()
+        line = stream.readline()
+        if not line.strip():
+            stream.seek(0)
+            line = stream.readline()
+        return RangePartitioner._address(line) if line.strip() else None
+
+    @staticmethod
+    def load(filename):
+        """ Loads a partitioner saved via dumps """
+        stream = open(filename)
+        try:
+            return RangePartitioner.loads(stream.read())
+        finally:
+            stream.close()
+
+    @staticmethod
+    def loads(text):
+        return RangePartitioner(map(int, text.split()))
+
+    def dumps(self):
+        """ Serializes the boundaries of this partitioner, one per line """
+        return ''.join(imap(lambda boundary: '%d\n' % boundary,
+                            self.boundaries))
@@ -0,0 +1,70 @@
+class RecordReader:
+    """
+    Block-buffered reader over the records (non-blank lines) of a file.
+
+    The file is read in large blocks, which are split into lines; each line
+    is parsed into a record (via the given parse function) as it is consumed.
+    The reader is an iterator over these records, and supports constant-time
+    lookahead (peek) and push-back, so that a consumer (such as a merge join)
+    may stop short of a record without rereading it.
+    """
+
+    block_size = 2**20
+
+    def __init__(self, file, parse=None, block_size=None):
+        self.file = file
+        self.parse = parse or (lambda line: line)
+        self.block_size = block_size or RecordReader.block_size
+        self.lines = iter([])
+        self.remainder = ''
+        # Records that have been pushed back (most recent last)
+        self.pushed = []
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        """ Consumes and returns the next record """
+        if self.pushed:
+            return self.pushed.pop()
+        line = self._next_line()
+        if line is None:
+            raise StopIteration
+        return self.parse(line)
+
+    def peek(self, default=None):
+        """ Gets the next record without consuming it (or default at EOF) """
+        if not self.pushed:
+            line = self._next_line()
+            if line is None:
+                return default
+            self.pushed.append(self.parse(line))
+        return self.pushed[-1]
+
+    def push_back(self, record):
+        """ Returns a record to the reader, to be consumed again next """
+        self.pushed.append(record)
+
+    def close(self):
+        self.file.close()
+
+    def _next_line(self):
+        """ Gets the next non-blank line, reading blocks as needed """
+        line = next(self.lines, None)
+        while line is None and self._fill():
+            line = next(self.lines, None)
+        return line
+
+    def _fill(self):
+        """ Reads the next block of lines; returns False at end of file """
+        block = self.file.read(self.block_size)
+        if block:
+            lines = (self.remainder + block).split('\n')
+            self.remainder = lines.pop()
+        elif self.remainder:
+            lines, self.remainder = [self.remainder], ''
+        else:
+            return False
+
+        self.lines = iter([line for line in lines if line.strip()])
+        return True
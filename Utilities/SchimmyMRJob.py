@@ -1,8 +1,12 @@
-from itertools import chain
+import os
+import tempfile
+from itertools import chain, imap, groupby
 from mrjob.job import MRJob
-from Utilities.RewindableFile import RewindableFile
+from Utilities.RecordReader import RecordReader
 from Utilities.PartitionUtilities import PartitionUtilities
-from Network.Node import TabSeparatedNodeSerializer
+from Utilities.PartitionManifest import PartitionManifest
+from Utilities.HDFSUtilities import HDFSUtilities
+from Utilities.LocalFileSystem import LocalFileSystem
 
 class SchimmyException(Exception): pass
 
@@ -26,21 +30,52 @@ class SchimmyMRJob(MRJob):
     encountered for any partition; this may be overridden via get_sentinel.
     Regardless, one key must be reserved for Schimmy initialization, and it
     must always be the first such key encountered.
+
+    Each reducer writes the records of its partition to a partition file of
+    their own (_partition-xxxxx) alongside its output, along with a manifest
+    (see PartitionManifest) recording that file's key range and record
+    count; reducers in subsequent steps use these to locate their partition
+    files.  Only the kvps identified by is_partition_record are written to
+    the partition file (in key order); the rest are written only to the job
+    output.
+
+    Without Hadoop, partition files may instead be kept in a local directory
+    (see use_local_partitions), in which case the job may be run via the
+    local runner.
+
+    A mapper_final may also be defined; its output is partitioned and
+    counted like that of the mapper.
+
+    A combiner may also be defined.  Since the reducer counts the kvps it
+    expects for each partition, the combiner emits an integer weight
+    alongside its output for each kvp it folds away; accordingly, combiners 
+    (like reducers) must not emit integer values of their own.
     """
 
+    # Jobconf variable naming a local directory that stands in for the HDFS
+    partition_directory_jobconf = 'schimmy.partition.directory'
+    # Name of the file (alongside a step's output) holding each partition;
+    # the leading underscore keeps Hadoop from reading it as input
+    partition_filename_format = '_partition-%05d'
+
     def __init__(self, **kwargs):
         super(SchimmyMRJob, self).__init__(**kwargs)
         self.count = None
+        self.output_file = None
+        self.output_filename = None
 
         # Wire up our Schimmy interceptors
         self.mapper_schimmy = self.mapper
         self.reducer_schimmy = self.reducer
+        self.combiner_schimmy = self.combiner
         self.reducer = self._reducer
         self.mapper = self._mapper
-        if 'mapper_final' in self.__dict__:
+        self.combiner = self._combiner
+        if 'mapper_final' in self.__dict__ or \
+                self.mapper_final.im_func is not MRJob.mapper_final.im_func:
             self.mapper_final_schimmy = self.mapper_final
         else:
-            self.mapper_final_schimmy = lambda _: iter([])
+            self.mapper_final_schimmy = lambda: iter([])
         self.mapper_final = self._mapper_final
 
         if len(self.args) > 1: 
@@ -64,6 +99,15 @@ class SchimmyMRJob(MRJob):
         """ Given a key, indicates its partition """
         raise NotImplemented
 
+    def is_partition_record(self, key, value):
+        """
+        Identifies the kvps that are carried forward in partition files (and
+        joined with the kvps shuffled to the following step).  By default,
+        every kvp is carried forward; kvps that are not (such as messages
+        bound for other keys) are written only to the job output.
+        """
+        return True
+
     def get_sentinel(self, partition):
         """ 
         Retrieves a value that is a minimum for the given partition.
@@ -78,17 +122,68 @@ class SchimmyMRJob(MRJob):
             self._partition_counts = [0] * self.options.partitions
         return self._partition_counts
 
+    def use_local_partitions(self, directory):
+        """
+        Keeps partition files in the given local directory rather than the
+        HDFS, so that the job may be run without Hadoop.  Since the local
+        runner divides the shuffled kvps among reducers by size rather than
+        by partition, a single reducer processes every partition in turn.
+        """
+        self.options.jobconf['mapred.reduce.tasks'] = 1
+        self.options.jobconf[SchimmyMRJob.partition_directory_jobconf] = \
+            directory
+
+    @property
+    def partition_directory(self):
+        """ The local directory standing in for the HDFS, if any """
+        return os.environ.get(
+            SchimmyMRJob.partition_directory_jobconf.replace('.', '_'))
+
+    @property
+    def storage(self):
+        """ The storage (see Storage) holding partition files """
+        return HDFSUtilities if not self.partition_directory else \
+               LocalFileSystem
+
+    @property
+    def step_directory(self):
+        """ The local directory holding the output of the current step """
+        return '%s/step-output/%d' % (self.partition_directory,
+                                      self.options.step_num)
+
+    @property
+    def download_directory(self):
+        """
+        The local directory into which the partition files of the current
+        step are downloaded.  When partitions are kept locally, it lies
+        within the partition directory (and is removed along with it);
+        otherwise a temporary directory is used.
+        """
+        if self.partition_directory:
+            return '%s/step-input-%d' % (self.partition_directory,
+                                         self.options.step_num)
+
     ########################################################
 
     @property
     def partition_file(self):
-        """ Reference to the partition file associated with this reducer """
+        """
+        Reader over the kvps of the partition file associated with this
+        reducer (partition files are written using the internal protocol)
+        """
         if "_partition_file" not in self.__dict__ or \
                 self._partition_file is None:
-            self._partition_file = \
-                RewindableFile(open(self.partition_filename), 1024)
+            self._partition_file = RecordReader(
+                open(self.partition_filename), self.partition_protocol.read)
         return self._partition_file
 
+    @property
+    def partition_protocol(self):
+        """ Protocol used to read lines from the partition file """
+        if "_partition_protocol" not in self.__dict__:
+            self._partition_protocol = self.internal_protocol()
+        return self._partition_protocol
+
     @property
     def partition_filename(self):
         """ Gets the partition filename associated with this reducer """
@@ -98,9 +193,9 @@ class SchimmyMRJob(MRJob):
             self._partition_filename = \
                 PartitionUtilities.get_partition_filename(
                     self.current_partition, self.options.partitions,
-                    lambda key: self.partition(key), 
-                    lambda line: TabSeparatedNodeSerializer.deserialize(line)\
-                                  .address)
+                    local_directory=self.download_directory,
+                    storage=self.storage,
+                    root=self.partition_directory or '/')
         
         return self._partition_filename
 
@@ -115,24 +210,93 @@ class SchimmyMRJob(MRJob):
                 self._partition_counts[partition] = None
             self.count = None
 
+    @property
+    def output_directory(self):
+        """
+        The directory to which this reducer's partition files and manifests
+        are written: the step directory when partitions are kept locally, or
+        otherwise the (task) output directory that Hadoop exposes through the
+        environment.  Absent either, neither is written.
+        """
+        return self.step_directory if self.partition_directory else \
+               os.environ.get('mapred_work_output_dir')
+
+    def write_manifest(self, partition):
+        """ Writes the manifest describing a partition file alongside it """
+        first_key, last_key, count = self.output_range
+        if self.output_directory:
+            PartitionManifest.write(self.output_directory, partition,
+                SchimmyMRJob.partition_filename_format % partition,
+                first_key, last_key, count, self.storage.upload_file)
+
+    def open_output(self, partition):
+        """
+        Opens the file to which the records of the given partition are
+        written (for use in the following step).  When partitions are kept
+        locally, it is written in place; otherwise it is written to a local
+        file that is uploaded once complete (see close_output).
+        """
+        filename = SchimmyMRJob.partition_filename_format % partition
+        if self.partition_directory:
+            if not os.path.exists(self.step_directory):
+                os.makedirs(self.step_directory)
+            self.output_file = open('%s/%s' % (self.step_directory,
+                                               filename), 'w')
+        elif self.output_directory:
+            handle, self.output_filename = tempfile.mkstemp()
+            self.output_file = os.fdopen(handle, 'w')
+
+    def close_output(self, partition):
+        """ Closes (and if need be, uploads) the file of a partition """
+        output_file, self.output_file = self.output_file, None
+        if output_file: output_file.close()
+
+        output_filename, self.output_filename = self.output_filename, None
+        if output_filename:
+            try:
+                self.storage.upload_file(output_filename, '%s/%s' % (
+                    self.output_directory,
+                    SchimmyMRJob.partition_filename_format % partition))
+            finally:
+                os.remove(output_filename)
+
+    def _record(self, (key, value)):
+        """
+        Writes the partition's records (see is_partition_record) to its
+        partition file, tracking the key range and count thereof.  The
+        merge join of the following step requires that these be unique and
+        in key order.
+        """
+        if self.is_partition_record(key, value) and \
+                self.partition(key) == self.current_partition:
+            first_key, last_key, count = self.output_range
+            if not last_key is None and key <= last_key:
+                raise SchimmyException('Partition %d is out of order: %r '
+                    'follows %r.' % (self.current_partition, key, last_key))
+            self.output_range = (first_key if not first_key is None
+                                 else key, key, count + 1)
+            if self.output_file:
+                self.output_file.write(
+                    self.partition_protocol.write(key, value) + '\n')
+        return key, value
+
     ########################################################
 
-    def _next_kvp(self):
-        """ Gets the next key/value pair from the partition file """
-        if not self.partition_file: return None
-        line = self.partition_file.readline().strip()
-        # Fake "repr" format
-        return map(eval, line.split('\t')) if line else None
-    
     def _next_until(self, key):
-        # Do while pairs left and the pair-key is less than the parameter-key
-        pair = self._next_kvp()
-        while pair is not None and (pair[0] < key or key is None): 
-            yield pair
-            pair = self._next_kvp()
-        if pair is not None:
-            yield pair
-        
+        """
+        Consumes the kvps in the partition file up to and including the given
+        key (or every kvp, if the key is None).  Later kvps are left unread.
+        Kvps that are not partition records (as may be found in the initial
+        partition files) are skipped.
+        """
+        reader = self.partition_file
+        pair = reader.peek()
+        while pair is not None and (key is None or pair[0] <= key):
+            pair = reader.next()
+            if self.is_partition_record(*pair):
+                yield pair
+            pair = reader.peek()
+
     ########################################################
 
     def _mapper(self, key, value): 
@@ -142,6 +306,11 @@ class SchimmyMRJob(MRJob):
             yield (self._update_partition(skey), skey), svalue
 
     def _mapper_final(self):
+        # Delegate to the underlying mapper_final (if any), whose output is
+        # partitioned and counted like that of the mapper
+        for skey, svalue in self.mapper_final_schimmy():
+            yield (self._update_partition(skey), skey), svalue
+
         # Emit all of our partition counts using the special
         # sentinel value (which ensures it is first in the shuffle)
         for partition, count in enumerate(self.partition_counts):
@@ -156,59 +325,99 @@ class SchimmyMRJob(MRJob):
 
     ########################################################
 
+    def _combiner(self, (partition, key), values):
+        # Sentinel counts are simply summed
+        if key == self.get_sentinel(partition):
+            yield (partition, key), sum(values)
+        else:
+            # Integer values are weights standing in for kvps folded away by
+            # an earlier combiner pass; delegate everything else.
+            weight, records = 0, []
+            for value in values:
+                if isinstance(value, (int, long)): weight += value
+                else: records.append(value)
+
+            results = list(self.combiner_schimmy(key, records))
+            for skey, svalue in results:
+                yield (partition, skey), svalue
+
+            # Emit a weight for every kvp we folded away
+            weight += len(records) - len(results)
+            if weight:
+                yield (partition, key), weight
+
+    ########################################################
+
     def _reducer(self, (partition, key), values):
+        # This is a single forward merge join between the shuffled keys and
+        # the (sorted) partition file; values are streamed rather than held.
         # We expect that the sentinel value will be the first kvp encountered.
         # For that special line, we initialize our reducer.
         if key == self.get_sentinel(partition):
             # Initialize our reducer metadata
             self.current_partition = partition
             self.count = sum(values)
-            results = iter([])
+            self.output_range = (None, None, 0)
+            self.open_output(partition)
         else:
             # All other kvps are "real" and we need to process them accordingly
-            values = list(values)
-            # Keep track of the kvps we've encountered (we expect one value for
-            # each mapper output, so use the length of values here).
-            self.count -= len(values)
-
-            # Process the kvp.
-            results = self.__process(key, values)
+            values = self._count(values)
+            for pair in self.__process(key, values):
+                yield self._record(pair)
+            # Count any values that were left unread
+            for _ in values: pass
 
         # When we've encountered all of the kvps that we're expecting, we can
-        # blast everything left in the partition file to our output stream.        
+        # blast everything left in the partition file to our output stream,
+        # and complete the partition.
         if self.count <= 0:
-            results = chain(results, self.__process_to_end())
+            for pair in self.__process_to_end():
+                yield self._record(pair)
+            self.close_output(partition)
+            self.write_manifest(partition)
             self.close_partition(partition)
 
-        return results
+    def _count(self, values):
+        """
+        Generates the values of a key, keeping track of the kvps we've
+        encountered as they pass (we expect one value for each mapper
+        output).  Integer values are weights for kvps that were folded by
+        the combiner, and are counted but not generated.
+        """
+        for value in values:
+            if isinstance(value, (int, long)):
+                self.count -= value
+            else:
+                self.count -= 1
+                yield value
 
     def __process_to_end(self):
         """ Blast all remaining kvps in the partition file """
-        return self.__process(None, [])
+        return self.__process(None, iter([]))
 
     def __process(self, target_key, values):
         """
         Utility function to sequentially handle lines in the partition file
-        until the target_key is located.  If we (inadvertantly) iterate past
-        the target_key, we rewind such that the incorrect key is not consumed.
+        until the target_key is located.  Kvps in the partition file are
+        reduced in runs of equal keys; the values for target_key are joined
+        with its run.  Since the partition file is read with lookahead, kvps
+        beyond the target_key are never consumed.
         """
-        key = None
+        found = False
 
         # Iterate across our partition file until we reach target_key
-        for (key, value) in self._next_until(target_key):
-            # Emit if we haven't reached the target key (or if its null)
-            if key <= target_key or target_key is None:
-                for pair in self.reducer_schimmy(key, ([value] + values) \
-                                    if key == target_key else [value]):
-                    yield pair
-
-        # Have we accidently gone too far?  If so, rewind once.
-        if key > target_key:
-            self._partition_file.rewind()
-        # We may not have actually output the current kvp above (perhaps 
-        # because the kvp does not exist in the partition file).  This is 
-        # ok, but we still need to emit it if that is the case.
-        if target_key != key and not target_key is None:
-            for pair in self.reducer_schimmy(key, values):
+        for key, pairs in groupby(self._next_until(target_key),
+                                  lambda (key, _): key):
+            file_values = imap(lambda (_, value): value, pairs)
+            if key == target_key:
+                found = True
+                file_values = chain(file_values, values)
+            for pair in self.reducer_schimmy(key, file_values):
+                yield pair
+
+        # The kvp may not exist in the partition file.  This is ok, but we
+        # still need to emit it if that is the case.
+        if not found and not target_key is None:
+            for pair in self.reducer_schimmy(target_key, values):
                 yield pair
 
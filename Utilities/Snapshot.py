@@ -0,0 +1,187 @@
+import mmap
+import struct
+import tempfile
+import numpy
+import Network.Network
+from Network.Node import Node, TabSeparatedNodeSerializer
+
+class Snapshot:
+    """
+    Binary, columnar representation of a network file.
+
+    A snapshot holds a table of rows, each of which is a node record.  The
+    first node_count rows are the network's nodes, sorted by address and
+    unique; any remaining rows are edges (SUCCESSFUL or INFECTING records).
+    Rows are stored as fixed-width columns (address, source, delay and
+    status), and hit lists are stored as an offsets/values pair such that
+    the hit list for row i is values[offsets[i]:offsets[i+1]].
+
+    Layout (little-endian, each column aligned to 16 bytes):
+
+        header:  magic (8), network class name (24), node count (8),
+                 row count (8), hit-list value count (8), address width (8)
+        columns: addresses, sources, delays (int32), statuses (int8),
+                 offsets (uint64, rows + 1), values
+
+    Addresses are 8 bytes wide, or 16 bytes (low and high words) for address
+    spaces wider than 64 bits.  Snapshots are read via mmap; for 8-byte
+    addresses the resulting arrays reference the mapped file directly
+    (copy-on-write), so no data is copied or parsed when loading.
+    """
+
+    magic = 'WORMNET\x01'
+    header = struct.Struct('<8s24sQQQQ')
+    alignment = 16
+    wide_address = numpy.dtype([('low', '<u8'), ('high', '<u8')])
+
+    def __init__(self, network, node_count, addresses, sources, delays,
+                       statuses, offsets, values):
+        self.network = network
+        self.node_count = node_count
+        self.addresses = addresses
+        self.sources = sources
+        self.delays = delays
+        self.statuses = statuses
+        self.offsets = offsets
+        self.values = values
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def hit_list(self, row):
+        """ Gets the hit list associated with the given row """
+        return self.values[self.offsets[row]:self.offsets[row + 1]]
+
+    def nodes(self, start=0):
+        """ Generates the rows in this snapshot as Node instances """
+        for row in xrange(start, len(self)):
+            yield Node(self.addresses[row], int(self.statuses[row]),
+                       map(int, self.hit_list(row)), int(self.delays[row]),
+                       int(self.sources[row]))
+
+    @staticmethod
+    def is_snapshot(filename):
+        """ Indicates whether the given file is a snapshot """
+        try:
+            with open(filename, 'rb') as stream:
+                return stream.read(len(Snapshot.magic)) == Snapshot.magic
+        except IOError:
+            return False
+
+    @staticmethod
+    def is_snapshot_filename(filename):
+        """ Indicates whether a file should be written as a snapshot """
+        return filename.endswith('.snapshot')
+
+    @staticmethod
+    def read(filename):
+        """ Maps the given snapshot file into memory """
+        with open(filename, 'rb') as stream:
+            buffer = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_COPY)
+
+        magic, name, node_count, row_count, value_count, width = \
+            Snapshot.header.unpack_from(buffer)
+        if magic != Snapshot.magic:
+            raise IOError('%s is not a network snapshot' % filename)
+
+        network = getattr(Network.Network, name.rstrip('\0'))
+        address_type = numpy.dtype('<u8') if width == 8 \
+                       else Snapshot.wide_address
+        columns = []
+        offset = Snapshot.header.size
+
+        for dtype, count in [(address_type, row_count),
+                             (address_type, row_count),
+                             (numpy.dtype('<i4'), row_count),
+                             (numpy.dtype('i1'), row_count),
+                             (numpy.dtype('<u8'), row_count + 1),
+                             (address_type, value_count)]:
+            offset = Snapshot._align(offset)
+            columns.append(numpy.frombuffer(buffer, dtype, count, offset)
+                           if count else numpy.empty(0, dtype))
+            offset += dtype.itemsize * count
+
+        addresses, sources, delays, statuses, offsets, values = columns
+        return Snapshot(network, node_count,
+                        Snapshot._from_address_column(addresses),
+                        Snapshot._from_address_column(sources),
+                        delays, statuses, offsets,
+                        Snapshot._from_address_column(values))
+
+    @staticmethod
+    def write(filename, network, node_count, addresses, sources, delays,
+                        statuses, hit_lists):
+        """
+        Writes a new snapshot.
+        filename: output filename
+        network: the network class associated with the snapshot
+        node_count: the number of leading rows that are nodes (the rest are
+                    edges)
+        addresses, sources, delays, statuses: row columns
+        hit_lists: a dictionary of non-empty hit lists keyed by row
+        """
+        width = 8 if network.address_space <= 2**64 else 16
+        lengths = numpy.zeros(len(addresses) + 1, dtype='<u8')
+        for row, hit_list in hit_lists.iteritems():
+            lengths[row + 1] = len(hit_list)
+        offsets = numpy.cumsum(lengths, dtype='<u8')
+        values = [value for row in sorted(hit_lists.iterkeys())
+                        for value in hit_lists[row]]
+
+        with open(filename, 'wb') as stream:
+            stream.write(Snapshot.header.pack(Snapshot.magic, network.__name__,
+                                              node_count, len(addresses),
+                                              len(values), width))
+            for column in [Snapshot._to_address_column(addresses, width),
+                           Snapshot._to_address_column(sources, width),
+                           numpy.asarray(delays, dtype='<i4'),
+                           numpy.asarray(statuses, dtype='i1'),
+                           offsets,
+                           Snapshot._to_address_column(values, width)]:
+                stream.write('\0' * (Snapshot._align(stream.tell()) -
+                                     stream.tell()))
+                column.tofile(stream)
+
+    @staticmethod
+    def as_text(filename, temporary_paths):
+        """
+        Returns the name of a tab-separated file holding the given network.
+        Text files are returned as-is; snapshots are converted to a temporary
+        file, whose name is appended to temporary_paths (the caller removes
+        it once it is no longer needed).
+        """
+        if not Snapshot.is_snapshot(filename):
+            return filename
+
+        with tempfile.NamedTemporaryFile('w', suffix='.network',
+                                         delete=False) as stream:
+            temporary_paths.append(stream.name)
+            for node in Snapshot.read(filename).nodes():
+                stream.write(TabSeparatedNodeSerializer.serialize(node)+'\n')
+        return stream.name
+
+    @staticmethod
+    def _align(offset):
+        return -(-offset // Snapshot.alignment) * Snapshot.alignment
+
+    @staticmethod
+    def _to_address_column(addresses, width):
+        """ Converts a sequence of addresses into a fixed-width column """
+        if width == 8:
+            return numpy.asarray(addresses, dtype='<u8')
+        addresses = numpy.array(addresses, dtype=object)
+        column = numpy.empty(len(addresses), dtype=Snapshot.wide_address)
+        column['low'] = (addresses & (2**64 - 1)).astype(numpy.uint64)
+        column['high'] = (addresses >> 64).astype(numpy.uint64)
+        return column
+
+    @staticmethod
+    def _from_address_column(column):
+        """
+        Converts a fixed-width column into an address array.  Wide addresses
+        are combined into (copied) Python longs.
+        """
+        if column.dtype != Snapshot.wide_address:
+            return column
+        return column['high'].astype(object) * 2**64 + \
+               column['low'].astype(object)
@@ -0,0 +1,70 @@
+import os
+from multiprocessing.pool import ThreadPool
+
+class Storage:
+    """
+    Interface to a file system holding the files shared between the tasks
+    and steps of a job (such as Schimmy partition files and manifests).
+
+    Implementations (HDFSUtilities, over the hadoop executable, and
+    LocalFileSystem) provide list_files, read_files, upload_file and
+    download_file; several files are fetched concurrently by a pool of
+    worker threads via download_files.
+    """
+
+    # The maximum number of concurrent downloads
+    download_threads = 8
+
+    @staticmethod
+    def list_files(path):
+        """
+        Generates a listing of the files residing at the given path and
+        recursively including all subdirectories, in the form produced by
+        hadoop dfs -lsr (only the trailing path of each line is significant)
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def read_files(uris):
+        """ Gets the concatenated contents of a list of files """
+        raise NotImplementedError
+
+    @staticmethod
+    def upload_file(local_filename, uri):
+        """ Copies a file from local storage to the given location """
+        raise NotImplementedError
+
+    @staticmethod
+    def download_file(uri, local_filename):
+        """ Copies a file to the given local filename """
+        raise NotImplementedError
+
+    @classmethod
+    def download_files(cls, uris, local_directory, create_directory=True):
+        """
+        Copies a list of files (concurrently) to a local directory, and
+        returns their local filenames
+        """
+        # Create the destination directory if requested
+        if create_directory and not os.path.exists(local_directory):
+            os.mkdir(local_directory)
+
+        local_filenames = map(lambda uri: Storage.local_filename(
+                                              uri, local_directory), uris)
+        download = lambda (uri, local_filename): \
+            cls.download_file(uri, local_filename)
+        if len(uris) > 1:
+            pool = ThreadPool(min(len(uris), cls.download_threads))
+            try: pool.map(download, zip(uris, local_filenames))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            map(download, zip(uris, local_filenames))
+
+        return local_filenames
+
+    @staticmethod
+    def local_filename(uri, local_directory):
+        """ Given a URI, converts it into a local filename """
+        return os.path.join(local_directory, uri.rstrip('/').rsplit('/', 1)[-1])
@@ -0,0 +1,95 @@
+import os
+import tempfile
+from itertools import ifilter
+import numpy
+from Network.InfectionStatus import InfectionStatus
+from Network.Node import Node, TabSeparatedNodeSerializer
+from Engine.NetworkState import NetworkState
+from Utilities.Snapshot import Snapshot
+
+class VulnerableStore:
+    """
+    Persistent side store holding the vulnerable nodes of a network.
+
+    Vulnerable nodes do not change until they are attacked, so rather than
+    shuffling them during every iteration, a propagation job may hold them
+    in a store and join each infection attempt against it.  The network
+    file that is actually propagated is then only the active frontier: the
+    infected (and immune) nodes along with their edges.
+
+    The store is a network snapshot, so loading it maps the sorted address
+    column directly and each lookup is a binary search.  Entries are never
+    removed; a node that has since been infected is present in the frontier
+    as INFECTED, which takes precedence over its stale vulnerable entry.
+    """
+
+    def __init__(self, state):
+        self.state = state
+
+    def __len__(self):
+        return len(self.state)
+
+    @staticmethod
+    def load(filename):
+        """ Maps the store held in the given snapshot file """
+        return VulnerableStore(
+            NetworkState.from_snapshot(Snapshot.read(filename)))
+
+    @staticmethod
+    def split(network, filenames, store_filename, temporary_paths):
+        """
+        Splits the given (tab-separated) network files into a store and a
+        frontier.  If the store does not yet exist, it is created from the
+        vulnerable nodes of the network; otherwise those nodes are taken to
+        be stored already and are discarded.  Returns the names of temporary
+        files holding the frontier, which are also appended to
+        temporary_paths (the caller removes them once the job has run).
+        """
+        create = not os.path.exists(store_filename)
+        vulnerable_nodes = []
+        frontier_filenames = []
+
+        for filename in filenames:
+            with open(filename) as stream:
+                with tempfile.NamedTemporaryFile('w', suffix='.network',
+                                                 delete=False) as frontier:
+                    temporary_paths.append(frontier.name)
+                    for line in ifilter(lambda line: line.strip(), stream):
+                        node = TabSeparatedNodeSerializer.deserialize(line)
+                        if node.status != InfectionStatus.VULNERABLE:
+                            frontier.write(line.rstrip('\r\n') + '\n')
+                        elif create:
+                            vulnerable_nodes.append(node)
+                    frontier_filenames.append(frontier.name)
+
+        if create:
+            NetworkState.from_nodes(network, vulnerable_nodes)\
+                .save_snapshot(store_filename)
+        return frontier_filenames
+
+    def find(self, address):
+        """ Gets the stored node with the given address (or None) """
+        indexes, present = self.state.index(numpy.array(
+            [address], dtype=NetworkState.address_dtype(self.state.network)))
+        if present[0]:
+            index = indexes[0]
+            return Node(address, int(self.state.statuses[index]),
+                        list(self.state.hit_lists.get(index, [])),
+                        int(self.state.delays[index]),
+                        int(self.state.sources[index]))
+
+    def merge(self, nodes):
+        """
+        Generates the given frontier nodes, followed by every stored node
+        that is not present in the frontier (as a stable node).
+        """
+        addresses = set()
+        for node in nodes:
+            if node.status != InfectionStatus.SUCCESSFUL and \
+               node.status != InfectionStatus.INFECTING:
+                addresses.add(int(node.address))
+            yield node
+
+        for node in self.state.nodes():
+            if not int(node.address) in addresses:
+                yield node
@@ -9,6 +9,8 @@ import matplotlib.pyplot as plt
 from Network.Node import Node, TabSeparatedNodeSerializer
 from Network.InfectionStatus import InfectionStatus
 import Utilities.NodePositions
+from Utilities.Snapshot import Snapshot
+from itertools import imap
 
 ###  define parameters
 networkTypes = ['Network256', 'NetworkGraphable']
@@ -68,13 +70,20 @@ if plotAllNodes:
 allNodes = {}
 successful = {}
 infecting = {}
-for line in f:
-    #file parser
+#file parser (text or binary snapshot)
+if Snapshot.is_snapshot(inputGraph):
+    inputNodes = Snapshot.read(inputGraph).nodes()
+else:
     Node.serializer = TabSeparatedNodeSerializer
-    node = Node.serializer.deserialize(line)
+    inputNodes = imap(Node.serializer.deserialize, f)
+
+for node in inputNodes:
 
     if node.status == InfectionStatus.SUCCESSFUL:
         successful[node.address] = {'status': node.status, 'hit_list':node.hit_list, 'source':node.source}
+    elif node.status == InfectionStatus.HANDOFF:
+        # Handoffs only carry hit lists to infected nodes
+        continue
     elif node.status == InfectionStatus.INFECTING:
         infecting[node.address] = {'status': node.status, 'hit_list':node.hit_list, 'source':node.source}
     else:
@@ -0,0 +1,112 @@
+import unittest
+from Engine.ArrayPropagate import ArrayPropagate
+from Engine.NetworkState import NetworkState
+from Network.InfectionStatus import InfectionStatus
+from Network.Network import Network256
+from Network.Node import Node, TabSeparatedNodeSerializer
+
+def full_network(infected=None):
+    """
+    Every address of a Network256 is vulnerable, so that every scan lands
+    on a node; infected maps infected addresses to their hit lists
+    """
+    infected = infected or {}
+    return NetworkState.from_nodes(Network256,
+        [Node(address, InfectionStatus.INFECTED, infected[address])
+         if address in infected else
+         Node(address, InfectionStatus.VULNERABLE)
+         for address in xrange(Network256.address_space)])
+
+def infected_addresses(state):
+    return [node.address for node in state.nodes()
+            if node.status == InfectionStatus.INFECTED]
+
+class ArrayPropagateTest(unittest.TestCase):
+    """ Checks the in-memory engine against the propagation rules """
+
+    def test_hit_list(self):
+        # The last hit-list entry is attacked, and the last half of the
+        # remainder is donated to it
+        state = full_network({0: range(1, 9)})
+        ArrayPropagate(state, propagation_delay=2).step()
+        nodes = dict((node.address, node) for node in state.nodes()
+                     if node.status != InfectionStatus.SUCCESSFUL)
+        self.assertEqual(infected_addresses(state), [0, 8])
+        self.assertEqual(list(nodes[8].hit_list), [4, 5, 6, 7])
+        self.assertEqual(nodes[8].propagation_delay, 2)
+        self.assertEqual(nodes[8].source, 0)
+
+        # The attacker scans again, and the back-link edge then halves its
+        # remaining list
+        ArrayPropagate(state, propagation_delay=2).step()
+        nodes = dict((node.address, node) for node in state.nodes()
+                     if node.status != InfectionStatus.SUCCESSFUL)
+        self.assertEqual(list(nodes[0].hit_list), [1, 2, 3])
+        self.assertEqual(nodes[0].source, 8)
+        self.assertTrue(7 in infected_addresses(state))
+
+    def test_propagation_delay(self):
+        # Delayed nodes count down rather than scan
+        state = NetworkState.from_nodes(Network256,
+            [Node(0, InfectionStatus.INFECTED, [5], 2),
+             Node(5, InfectionStatus.VULNERABLE)])
+        engine = ArrayPropagate(state)
+        engine.step()
+        engine.step()
+        self.assertEqual(infected_addresses(state), [0])
+        engine.step()
+        self.assertEqual(infected_addresses(state), [0, 5])
+
+    def test_saturation(self):
+        # Infections never recover, and eventually reach every node
+        state = full_network({0: []})
+        engine = ArrayPropagate(state, seed=0)
+        count = 1
+        for _ in xrange(100):
+            engine.step()
+            self.assertTrue(len(infected_addresses(state)) >= count)
+            count = len(infected_addresses(state))
+        self.assertEqual(count, Network256.address_space)
+
+    def test_binomial_sampling(self):
+        # With every address occupied, every scan hits
+        state = full_network({0: []})
+        ArrayPropagate(state, seed=0, binomial_sampling=True).execute(100)
+        self.assertEqual(len(infected_addresses(state)),
+                         Network256.address_space)
+
+        # On a sparse network, the number of hits matches uniform scanning
+        # in distribution
+        infected = range(0, 256, 8)
+        counts = []
+        for binomial_sampling in (False, True):
+            count = 0
+            for seed in xrange(200):
+                state = NetworkState.from_nodes(Network256,
+                    [Node(address, InfectionStatus.INFECTED
+                                   if address in infected
+                                   else InfectionStatus.VULNERABLE)
+                     for address in xrange(0, 256, 2)])
+                ArrayPropagate(state, seed=seed,
+                               binomial_sampling=binomial_sampling).step()
+                count += len(infected_addresses(state)) - len(infected)
+            counts.append(count)
+        self.assertTrue(abs(counts[0] - counts[1]) < 0.1 * counts[0])
+
+    def test_seed(self):
+        states = [full_network({0: [], 100: []}) for _ in xrange(2)]
+        for state in states:
+            ArrayPropagate(state, seed=7).execute(5)
+        self.assertEqual(
+            map(TabSeparatedNodeSerializer.serialize, states[0].nodes()),
+            map(TabSeparatedNodeSerializer.serialize, states[1].nodes()))
+
+    def test_volatile(self):
+        state = full_network({0: [3, 9]})
+        ArrayPropagate(state, emit_volatile=True).step()
+        self.assertEqual([(node.address, node.status, list(node.hit_list),
+                           node.source) for node in state.volatile],
+                         [(9, InfectionStatus.INFECTING, [3], 0)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import random
+import tempfile
+import unittest
+from Network.InfectionStatus import InfectionStatus
+from Network.Network import IPv4, IPv6
+from Network.Node import TabSeparatedNodeSerializer
+from Propagate import Propagate
+from Utilities.BloomFilter import BloomFilter
+from Utilities.PropagationJob import PropagationJob
+from tests.test_snapshot import random_nodes
+
+class BloomFilterTest(unittest.TestCase):
+    """ Checks the membership guarantees of the address filter """
+
+    def setUp(self):
+        handle, self.filename = tempfile.mkstemp()
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def addresses(self, network, count, generator):
+        return [generator.randrange(network.address_space)
+                for _ in xrange(count)]
+
+    def test_no_false_negatives(self):
+        generator = random.Random(0)
+        for network in (IPv4, IPv6):
+            addresses = self.addresses(network, 5000, generator)
+            bloom_filter = BloomFilter.create(len(addresses), 0.01)
+            bloom_filter.add(addresses)
+            # The scalar path (used by mappers) agrees with the vectorized
+            # path used for construction
+            for address in addresses:
+                self.assertTrue(address in bloom_filter)
+
+    def test_error_rate(self):
+        generator = random.Random(1)
+        for network in (IPv4, IPv6):
+            bloom_filter = BloomFilter.create(5000, 0.01)
+            bloom_filter.add(self.addresses(network, 5000, generator))
+            false_positives = sum(address in bloom_filter for address in
+                                  self.addresses(network, 20000, generator))
+            self.assertTrue(false_positives < 20000 * 0.02)
+
+    def test_save(self):
+        addresses = self.addresses(IPv6, 1000, random.Random(2))
+        bloom_filter = BloomFilter.create(len(addresses))
+        bloom_filter.add(addresses)
+        bloom_filter.save(self.filename)
+        loaded = BloomFilter.load(self.filename)
+        self.assertEqual((loaded.bit_count, loaded.hash_count),
+                         (bloom_filter.bit_count, bloom_filter.hash_count))
+        self.assertEqual(loaded.bits.tolist(), bloom_filter.bits.tolist())
+
+    def test_network_file(self):
+        nodes = list(random_nodes(IPv4, 1000, random.Random(3)))
+        with open(self.filename, 'w') as stream:
+            for node in nodes:
+                stream.write(TabSeparatedNodeSerializer.serialize(node)+'\n')
+        bloom_filter = BloomFilter.from_network_file(self.filename)
+        for node in nodes:
+            self.assertTrue(node.address in bloom_filter)
+        # Edges do not contribute to the filter's capacity
+        self.assertEqual(bloom_filter.bit_count,
+                         BloomFilter.create(len(filter(lambda node:
+                             node.status not in (InfectionStatus.SUCCESSFUL,
+                                                 InfectionStatus.INFECTING),
+                             nodes))).bit_count)
+
+    def test_job_inputs(self):
+        # A job's filter holds the addresses of all of its inputs
+        job = Propagate(args=['--network', 'IPv4'])
+        generator = random.Random(4)
+        filenames = [self.filename, job.temporary_file()]
+        nodes = []
+        for filename in filenames:
+            nodes.append(list(random_nodes(IPv4, 500, generator)))
+            with open(filename, 'w') as stream:
+                for node in nodes[-1]:
+                    stream.write(
+                        TabSeparatedNodeSerializer.serialize(node)+'\n')
+        try:
+            job.create_bloom_filter(filenames)
+            bloom_filter = BloomFilter.load(PropagationJob.uploaded_files[
+                PropagationJob.bloom_filter_filename])
+        finally:
+            map(os.remove, job.temporary_paths)
+        for node in sum(nodes, []):
+            self.assertTrue(node.address in bloom_filter)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import random
+import tempfile
+import unittest
+from itertools import imap
+from Creation.CreateHitLists import CreateHitLists
+from Network.InfectionStatus import InfectionStatus
+from Network.Node import Node, TabSeparatedNodeSerializer
+
+class CreateHitListsTest(unittest.TestCase):
+    """ Checks that hit lists are drawn from the vulnerable population """
+
+    def setUp(self):
+        generator = random.Random(0)
+        self.nodes = [Node(address, InfectionStatus.INFECTED
+                                    if index % 50 == 0
+                                    else InfectionStatus.VULNERABLE)
+                      for index, address in enumerate(sorted(
+                          generator.sample(xrange(2**32), 500)))]
+        handle, self.filename = tempfile.mkstemp()
+        with os.fdopen(handle, 'w') as stream:
+            for node in self.nodes:
+                stream.write(TabSeparatedNodeSerializer.serialize(node)+'\n')
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def run_job(self, size, infected):
+        with CreateHitLists(args=['-r', 'inline', '--size', str(size),
+                                  '--infected', str(infected),
+                                  self.filename]).make_runner() as runner:
+            runner.run()
+            return sorted(imap(TabSeparatedNodeSerializer.deserialize,
+                               runner.stream_output()),
+                          key=lambda node: node.address)
+
+    def test_hit_lists(self):
+        nodes = self.run_job(5, 10)
+        vulnerable = set(node.address for node in self.nodes if
+                         node.status == InfectionStatus.VULNERABLE)
+        self.assertEqual([(node.address, node.status) for node in nodes],
+                         [(node.address, node.status) for node in self.nodes])
+
+        hit_lists = [list(node.hit_list) for node in nodes
+                     if node.status == InfectionStatus.INFECTED]
+        self.assertEqual(len(hit_lists), 10)
+        addresses = sum(hit_lists, [])
+        self.assertEqual(map(len, hit_lists), [5] * 10)
+        # Hit lists are disjoint while the pool lasts
+        self.assertEqual(len(set(addresses)), 50)
+        self.assertTrue(set(addresses) <= vulnerable)
+
+    def test_overlap(self):
+        # More hit-list entries than vulnerable hosts are requested
+        nodes = self.run_job(100, 10)
+        for node in nodes:
+            if node.status == InfectionStatus.INFECTED:
+                self.assertEqual(len(node.hit_list), 100)
+                self.assertEqual(len(set(node.hit_list)), 100)
+
+if __name__ == '__main__':
+    unittest.main()
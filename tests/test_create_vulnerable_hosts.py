@@ -0,0 +1,52 @@
+import unittest
+import numpy
+from Creation.CreateVulnerableHosts import CreateVulnerableHosts
+from Network.InfectionStatus import InfectionStatus
+from Network.Network import Network, Network256, IPv6
+
+class SparseNetwork(Network):
+    """ A network sparse enough to be sampled in several chunks """
+    address_space = 2**20
+    probability_vulnerable = 0.01
+
+class CreateVulnerableHostsTest(unittest.TestCase):
+    """ Checks that sampled hosts are distinct, sorted and in range """
+
+    def check(self, network, nodes_to_infect):
+        nodes = list(CreateVulnerableHosts.execute(
+            network, nodes_to_infect, numpy.random.RandomState(0)))
+        addresses = [node.address for node in nodes]
+        self.assertEqual(len(nodes), long(network.address_space *
+                                          network.probability_vulnerable))
+        self.assertEqual(addresses, sorted(set(addresses)))
+        self.assertTrue(0 <= addresses[0] and
+                        addresses[-1] < network.address_space)
+        self.assertEqual(len(filter(lambda node: node.status ==
+                                    InfectionStatus.INFECTED, nodes)),
+                         min(nodes_to_infect, len(nodes)))
+        self.assertEqual(set(node.status for node in nodes) -
+                         set([InfectionStatus.INFECTED]),
+                         set([InfectionStatus.VULNERABLE]))
+
+    def test_dense(self):
+        self.check(Network256, 3)
+
+    def test_chunks(self):
+        chunk_size = CreateVulnerableHosts.chunk_size
+        CreateVulnerableHosts.chunk_size = 2**10
+        try:
+            self.check(SparseNetwork, 10)
+        finally:
+            CreateVulnerableHosts.chunk_size = chunk_size
+
+    def test_wide(self):
+        addresses = numpy.concatenate(list(CreateVulnerableHosts.sample(
+            IPv6.address_space, 5000, numpy.random.RandomState(1))))
+        self.assertEqual(len(addresses), 5000)
+        self.assertEqual(addresses.tolist(), sorted(set(addresses.tolist())))
+        self.assertTrue(max(addresses) < IPv6.address_space)
+        # The top bits of wide addresses are populated
+        self.assertTrue(max(addresses) > IPv6.address_space / 2)
+
+if __name__ == '__main__':
+    unittest.main()
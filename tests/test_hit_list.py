@@ -0,0 +1,55 @@
+import cPickle
+import random
+import unittest
+from Network.HitList import HitList
+
+class HitListTest(unittest.TestCase):
+    """ Checks that hit-list views behave as lists of addresses """
+
+    def test_slices(self):
+        generator = random.Random(0)
+        for width in (2**32, 2**128):
+            addresses = [generator.randrange(width) for _ in xrange(20)]
+            hit_list = HitList(addresses)
+            for _ in xrange(500):
+                start, stop = generator.randint(-25, 25), \
+                              generator.randint(-25, 25)
+                self.assertEqual(list(hit_list[start:stop]),
+                                 addresses[start:stop])
+                self.assertEqual(list(hit_list[start:stop][1:]),
+                                 addresses[start:stop][1:])
+            self.assertEqual(hit_list[-1], addresses[-1])
+            self.assertRaises(IndexError, hit_list.__getitem__, 20)
+
+    def test_pop(self):
+        addresses = range(10)
+        hit_list = HitList(addresses)
+        half = hit_list[len(hit_list)/2:]
+        while hit_list:
+            self.assertEqual(hit_list.pop(), addresses.pop())
+            self.assertEqual(list(hit_list), addresses)
+        self.assertRaises(IndexError, hit_list.pop)
+        # Views are unaffected by popping from one another
+        self.assertEqual(list(half), range(5, 10))
+        self.assertEqual(half.pop(), 9)
+        self.assertEqual(list(half), range(5, 9))
+
+    def test_pickle(self):
+        hit_list = HitList(range(100))[10:20]
+        copy = cPickle.loads(cPickle.dumps(hit_list, 2))
+        self.assertEqual(copy, hit_list)
+        self.assertEqual(len(copy.values), 10)
+
+    def test_equality(self):
+        self.assertEqual(HitList([1, 2, 3]), [1, 2, 3])
+        self.assertEqual(HitList([1, 2, 3])[1:], HitList([2, 3]))
+        self.assertNotEqual(HitList([1, 2, 3]), [1, 2])
+        self.assertFalse(HitList([]))
+        # Other types are not sequences of addresses
+        self.assertNotEqual(HitList([1]), 1)
+        self.assertNotEqual(HitList([]), None)
+        self.assertFalse(HitList([]) == None)
+        self.assertRaises(TypeError, hash, HitList([1]))
+
+if __name__ == '__main__':
+    unittest.main()
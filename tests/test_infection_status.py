@@ -0,0 +1,50 @@
+import random
+import subprocess
+import sys
+import unittest
+from Network.InfectionStatus import InfectionStatus
+
+class InfectionStatusTest(unittest.TestCase):
+    """ Checks the precomputed transition tables against the state diagram """
+
+    statuses = [None] + range(InfectionStatus.UNKNOWN,
+                              InfectionStatus.HANDOFF + 1)
+
+    def test_transitions(self):
+        for left in self.statuses:
+            for right in self.statuses:
+                self.assertEqual(InfectionStatus.transitions[left, right],
+                                 InfectionStatus._compare_rules(left, right))
+                self.assertEqual(InfectionStatus.compare(left, right),
+                                 InfectionStatus._compare_rules(left, right))
+
+    def test_transition_array(self):
+        encode = lambda status: InfectionStatus.NONE if status is None \
+                                else status
+        for left in self.statuses:
+            for right in self.statuses:
+                self.assertEqual(
+                    InfectionStatus.compare_arrays(encode(left),
+                                                   encode(right)),
+                    encode(InfectionStatus._compare_rules(left, right)))
+
+    def test_without_numpy(self):
+        # Only compare_arrays requires numpy
+        self.assertEqual(subprocess.call([sys.executable, '-c',
+            'import sys; sys.modules["numpy"] = None\n'
+            'from Network.InfectionStatus import InfectionStatus as S\n'
+            'assert S.compare(S.VULNERABLE, S.INFECTING) == S.INFECTED\n'
+            'assert S.compare_all([S.INFECTED, S.SUCCESSFUL]) == S.INFECTED']),
+            0)
+
+    def test_compare_all(self):
+        generator = random.Random(0)
+        for _ in xrange(1000):
+            statuses = [generator.choice(self.statuses[1:])
+                        for _ in xrange(generator.randint(0, 8))]
+            self.assertEqual(InfectionStatus.compare_all(statuses),
+                             reduce(InfectionStatus._compare_rules,
+                                    statuses, None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import os
+import shutil
+import tempfile
+import unittest
+from Utilities.LocalFileSystem import LocalFileSystem
+
+class LocalFileSystemTest(unittest.TestCase):
+    """ Checks the local stand-in for HDFS used by Schimmy jobs """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, contents):
+        filename = os.path.join(self.directory, name)
+        with open(filename, 'w') as stream:
+            stream.write(contents)
+        return filename
+
+    def test_download_file(self):
+        first, second = self.write('first', '1'), self.write('second', '2')
+        local_filename = os.path.join(self.directory, 'local')
+        LocalFileSystem.download_file(first, local_filename)
+        # Downloading again (or in place of another file) replaces the link
+        LocalFileSystem.download_file(first, local_filename)
+        self.assertEqual(open(local_filename).read(), '1')
+        LocalFileSystem.download_file(second, local_filename)
+        self.assertEqual(open(local_filename).read(), '2')
+        os.remove(second)
+        LocalFileSystem.download_file(first, local_filename)
+        self.assertEqual(open(local_filename).read(), '1')
+        self.assertEqual(open(first).read(), '1')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+import numpy
+from Network.Network import Network256, IPv6
+
+class VulnerableAddressesTest(unittest.TestCase):
+    """ Checks the geometric skipping between vulnerable addresses """
+
+    def setUp(self):
+        numpy.random.seed(0)
+
+    def test_range(self):
+        addresses = list(Network256.vulnerable_addresses(1000, 100000, 0.05))
+        self.assertEqual(addresses, sorted(set(addresses)))
+        self.assertTrue(1000 <= addresses[0] and addresses[-1] < 101000)
+        # The count is binomial, with a standard deviation of about 69
+        self.assertTrue(abs(len(addresses) - 5000) < 350)
+
+    def test_certain(self):
+        self.assertEqual(list(Network256.vulnerable_addresses(probability=1)),
+                         range(256))
+        self.assertEqual(list(Network256.vulnerable_addresses(probability=0)),
+                         [])
+
+    def test_wide(self):
+        addresses = list(IPv6.vulnerable_addresses(
+            IPv6.address_space - 2**100, 2**100, 2**-90))
+        self.assertEqual(addresses, sorted(set(addresses)))
+        self.assertTrue(IPv6.address_space - 2**100 <= addresses[0] and
+                        addresses[-1] < IPv6.address_space)
+        self.assertTrue(abs(len(addresses) - 1024) < 160)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import random
+import unittest
+from itertools import imap
+from Network.HitList import HitList
+from Network.InfectionStatus import InfectionStatus
+from Network.Node import Node
+from Network.NodeAccumulator import NodeAccumulator
+from Propagate import Propagate
+
+class Options(object):
+    def __init__(self, **options):
+        self.__dict__.update(options)
+
+def reducing_job(**options):
+    """ A propagation job holding only options, for calling its reducer """
+    job = Propagate.__new__(Propagate)
+    job.options = Options(vulnerable_store=None, **options)
+    return job
+
+def list_reducer(options, key, nodes):
+    """
+    The list-based reducer that preceded NodeAccumulator: every record for
+    the address is held, and each property is resolved over the list
+    """
+    statuses = map(lambda n: n.status, nodes)
+    status = reduce(InfectionStatus._compare_rules, statuses, None)
+    successful = InfectionStatus.SUCCESSFUL in statuses
+
+    if status in (InfectionStatus.VULNERABLE, InfectionStatus.INFECTED,
+                  InfectionStatus.IMMUNE):
+        # The longest hit list (ties go to the later list), cut in half for
+        # every successful infection
+        hit_list = reduce(lambda a, n: a if len(a) > len(n.hit_list)
+                                       else n.hit_list, nodes, [])
+        handoffs = []
+        if options.defer_hit_lists:
+            for edge in filter(lambda n: n.status ==
+                                   InfectionStatus.SUCCESSFUL, nodes):
+                if hit_list:
+                    handoffs.append(Node(edge.source,
+                                         InfectionStatus.HANDOFF,
+                                         hit_list[len(hit_list)/2:],
+                                         source=edge.address))
+                hit_list = hit_list[:len(hit_list)/2]
+        elif successful:
+            hit_list = hit_list[:len(hit_list)/2]
+
+        delay = max(imap(lambda n: n.propagation_delay, nodes))
+        if successful:
+            delay = max(delay, options.propagation_delay)
+        result = Node(key, status, hit_list, delay,
+                      max(imap(lambda n: n.source, nodes)))
+        yield Node.serializer.serialize(result)
+
+        if status == InfectionStatus.INFECTED and \
+                not InfectionStatus.INFECTED in statuses and \
+                InfectionStatus.INFECTING in statuses:
+            yield Node.serializer.serialize(
+                Node(result.source, InfectionStatus.SUCCESSFUL,
+                     source=result.address))
+        for handoff in handoffs:
+            yield Node.serializer.serialize(handoff)
+
+    if options.emit_volatile:
+        for node in nodes:
+            if node.status == InfectionStatus.INFECTING:
+                yield Node.serializer.serialize(node)
+
+class NodeAccumulatorTest(unittest.TestCase):
+    """ Checks the streaming fold against the list-based reducer """
+
+    statuses = [InfectionStatus.VULNERABLE, InfectionStatus.INFECTED,
+                InfectionStatus.IMMUNE, InfectionStatus.INFECTING,
+                InfectionStatus.SUCCESSFUL, InfectionStatus.HANDOFF]
+
+    def random_group(self, key, generator):
+        return [Node(key, generator.choice(self.statuses),
+                     HitList(generator.sample(xrange(300),
+                                              generator.randint(0, 6))),
+                     generator.randint(0, 3), generator.randint(0, 50))
+                for _ in xrange(generator.randint(1, 8))]
+
+    def test_reducer(self):
+        generator = random.Random(0)
+        for _ in xrange(2000):
+            options = dict(defer_hit_lists=generator.randint(0, 1),
+                           propagation_delay=generator.randint(0, 3),
+                           emit_volatile=generator.randint(0, 1))
+            nodes = self.random_group(17, generator)
+            values = map(lambda n: Node.serializer.serialize(n)[1], nodes)
+            self.assertEqual(
+                sorted(map(repr, reducing_job(**options).reducer(17, values))),
+                sorted(map(repr, list_reducer(Options(**options), 17,
+                                              nodes))))
+
+    def test_fold(self):
+        generator = random.Random(1)
+        for _ in xrange(2000):
+            nodes = self.random_group(17, generator)
+            fold = NodeAccumulator()
+            for node in nodes:
+                fold.add(node)
+            statuses = map(lambda n: n.status, nodes)
+            self.assertEqual(fold.status,
+                             InfectionStatus.compare_all(statuses))
+            self.assertEqual(fold.statuses, set(statuses))
+            self.assertEqual(fold.hit_list,
+                             reduce(lambda a, n: a if len(a) > len(n.hit_list)
+                                                 else n.hit_list, nodes, []))
+            self.assertEqual(fold.successful,
+                             [node.source for node in nodes if node.status ==
+                              InfectionStatus.SUCCESSFUL])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import random
+import unittest
+from Engine.ArrayPropagate import ArrayPropagate
+from Engine.NetworkState import NetworkState
+from Engine.ParallelPropagate import ParallelPropagate
+from Network.InfectionStatus import InfectionStatus
+from Network.Network import Network256
+from Network.Node import Node, TabSeparatedNodeSerializer
+
+def random_state(network, count, generator):
+    """ A network with a few infected nodes, some of which have hit lists """
+    addresses = sorted(generator.sample(xrange(network.address_space), count))
+    return NetworkState.from_nodes(network,
+        [Node(address, InfectionStatus.INFECTED,
+              generator.sample(addresses, generator.choice([0, 0, 4])),
+              generator.randint(0, 1))
+         if generator.random() < 0.1 else
+         Node(address, InfectionStatus.VULNERABLE)
+         for address in addresses])
+
+def text(state):
+    return map(TabSeparatedNodeSerializer.serialize, state.nodes())
+
+class ParallelPropagateTest(unittest.TestCase):
+    """ Checks that partitioned engines agree with a single engine """
+
+    def compare(self, network, count, iterations, **options):
+        for processes in (1, 2, 3):
+            expected = random_state(network, count, random.Random(0))
+            ArrayPropagate(expected, seed=5, **options).execute(iterations)
+            state = random_state(network, count, random.Random(0))
+            ParallelPropagate(state, processes, seed=5,
+                              **options).execute(iterations)
+            self.assertEqual(text(state), text(expected))
+
+    def test_uniform_scans(self):
+        self.compare(Network256, 100, 6, propagation_delay=1)
+
+    def test_binomial_sampling(self):
+        self.compare(Network256, 150, 6, propagation_delay=1,
+                     binomial_sampling=True)
+
+    def test_volatile(self):
+        self.compare(Network256, 100, 3, emit_volatile=True)
+
+if __name__ == '__main__':
+    unittest.main()
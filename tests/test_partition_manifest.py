@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+import unittest
+from Utilities.PartitionManifest import PartitionManifest
+
+class PartitionManifestTest(unittest.TestCase):
+    """ Checks that manifests describe each partition exactly once """
+
+    def test_entries(self):
+        entries = [(0, 'part-00003', 5, 2**100, 7),
+                   (1, 'part-00000', None, None, 0)]
+        for entry in entries:
+            self.assertEqual(PartitionManifest.parse_entry(
+                PartitionManifest.format_entry(*entry)), entry)
+
+    def test_complete(self):
+        text = PartitionManifest.format_entry(1, 'part-00000', 4, 9, 2) + \
+               PartitionManifest.format_entry(0, 'part-00001', 1, 3, 2)
+        manifest = PartitionManifest.parse(text + '\n')
+        self.assertTrue(manifest.is_complete(2))
+        self.assertEqual(manifest.filename(1), 'part-00000')
+        self.assertFalse(manifest.is_complete(3))
+        # A partition written twice (as by a speculative task) is rejected
+        self.assertFalse(PartitionManifest.parse(
+            text + PartitionManifest.format_entry(1, 'part-00002', 4, 9, 2))
+            .is_complete(2))
+
+    def test_write(self):
+        directory = tempfile.mkdtemp()
+        try:
+            PartitionManifest.write(directory, 3, 'part-00001', 10, 20, 4,
+                                    shutil.copy)
+            with open('%s/_manifest-00003' % directory) as stream:
+                self.assertEqual(PartitionManifest.parse(stream.read())
+                                     .entries,
+                                 {3: (3, 'part-00001', 10, 20, 4)})
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import random
+import tarfile
+import tempfile
+import unittest
+from Network.Network import IPv4
+from Network.Node import TabSeparatedNodeSerializer
+from Utilities.Partitions import Partitions
+from tests.test_snapshot import random_nodes
+
+class PartitionsTest(unittest.TestCase):
+    """ Checks the external sort against an in-memory sort """
+
+    partitions = 5
+
+    def setUp(self):
+        self.lines = map(lambda node:
+                             TabSeparatedNodeSerializer.serialize(node) + '\n',
+                         random_nodes(IPv4, 2000, random.Random(0)))
+        self.filename, self.tar_filename = self.temporary_file(), \
+                                           self.temporary_file()
+
+    def tearDown(self):
+        os.remove(self.filename)
+        os.remove(self.tar_filename)
+
+    def temporary_file(self):
+        handle, filename = tempfile.mkstemp()
+        os.close(handle)
+        return filename
+
+    def partitioner(self, address):
+        return IPv4.partition(address, self.partitions)
+
+    def check(self, lines, **options):
+        with open(self.filename, 'w') as stream:
+            stream.writelines(lines)
+        Partitions.create(self.filename, self.partitions, self.partitioner,
+                          tar_filename=self.tar_filename, **options)
+
+        archive = tarfile.open(self.tar_filename)
+        try:
+            for partition in xrange(self.partitions):
+                # Records sharing an address may appear in any order
+                actual = archive.extractfile(
+                             'part-%05d' % partition).readlines()
+                addresses = map(Partitions._address, actual)
+                self.assertEqual(addresses, sorted(addresses))
+                self.assertEqual(sorted(actual),
+                                 sorted(filter(lambda line: self.partitioner(
+                                                   Partitions._address(line))
+                                                   == partition, lines)))
+        finally:
+            archive.close()
+
+    def test_in_memory(self):
+        lines = list(self.lines)
+        random.Random(1).shuffle(lines)
+        self.check(lines, processes=2)
+
+    def test_runs(self):
+        # A small budget spills many sorted runs to be merged
+        lines = list(self.lines)
+        random.Random(2).shuffle(lines)
+        self.check(lines, memory_budget=20000, processes=3)
+
+    def test_sorted_input(self):
+        # Edges follow the nodes, so the input is sorted but for the edges
+        nodes = self.lines[:2000]
+        self.check(nodes, memory_budget=20000)
+        self.check(self.lines, memory_budget=20000)
+
+    def test_missing_input(self):
+        self.assertEqual(Partitions.create(self.filename + '-missing', 2,
+                                           self.partitioner,
+                                           fail_silently=True), None)
+        self.assertRaises(IOError, Partitions.create,
+                          self.filename + '-missing', 2, self.partitioner)
+
+if __name__ == '__main__':
+    unittest.main()
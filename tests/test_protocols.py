@@ -0,0 +1,56 @@
+import random
+import unittest
+from Network.HitList import HitList
+from Network.InfectionStatus import InfectionStatus
+from Network.Network import IPv4, IPv6
+from Network.Node import Node
+from Network.NodeProtocol import NodeProtocol, EncodedNodeValue, \
+                                 PartitionedNodeProtocol
+from tests.test_snapshot import random_nodes
+
+class NodeProtocolTest(unittest.TestCase):
+    """ Checks that node records survive encoding and decoding """
+
+    def test_round_trip(self):
+        protocol = NodeProtocol()
+        for network in (IPv4, IPv6):
+            for node in random_nodes(network, 200, random.Random(0)):
+                address, value = Node.serializer.serialize(node)
+                line = protocol.write(address, value)
+                self.assertEqual(protocol.read(line), (address, value))
+                self.assertTrue(isinstance(protocol.read(line)[1][1], HitList))
+                self.assertEqual(protocol.write(*protocol.read(line)), line)
+
+    def test_encoded_round_trip(self):
+        protocol = NodeProtocol()
+        for node in random_nodes(IPv6, 200, random.Random(1)):
+            line = protocol.write(*Node.serializer.serialize(node))
+            address, value = protocol.read_encoded(line)
+            self.assertTrue(isinstance(value, EncodedNodeValue))
+            self.assertEqual(value.status, node.status)
+            self.assertEqual((address, value.decode()), protocol.read(line))
+            # Encoded metadata is written back verbatim
+            self.assertEqual(protocol.write(address, value), line)
+
+    def test_legacy_values(self):
+        protocol = NodeProtocol()
+        self.assertEqual(protocol.read('6812\t[3, [1, 2], 0, 9]'),
+                         (6812, (3, [1, 2], 0, 9)))
+        self.assertEqual(protocol.read('6812\t[1, [], 2, 0]'),
+                         (6812, (1, [], 2, 0)))
+        self.assertEqual(protocol.read_encoded('6812\t[3, [1, 2], 0, 9]')[1],
+                         '3\t0\t9\t1,2')
+
+    def test_partitioned_keys(self):
+        protocol = PartitionedNodeProtocol(address_width=3)
+        self.assertEqual(protocol.write((2, 17), 4), '00002,017\t4')
+        self.assertEqual(protocol.read('00002,017\t4'), ((2, 17), 4))
+        self.assertEqual(protocol.read_encoded('00002,-01\t4'), ((2, -1), 4))
+        line = protocol.write((1, 5), (InfectionStatus.INFECTED, [7], 0, 2))
+        self.assertEqual(protocol.read(line),
+                         ((1, 5), (InfectionStatus.INFECTED, [7], 0, 2)))
+        self.assertEqual(protocol.read_encoded(line)[1].status,
+                         InfectionStatus.INFECTED)
+
+if __name__ == '__main__':
+    unittest.main()
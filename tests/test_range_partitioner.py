@@ -0,0 +1,88 @@
+import os
+import random
+import tempfile
+import unittest
+from Network.Network import Network256, IPv4, IPv6
+from Utilities.RangePartitioner import RangePartitioner
+
+class RangePartitionerTest(unittest.TestCase):
+    """ Checks the assignment and balance of range partitions """
+
+    def setUp(self):
+        handle, self.filename = tempfile.mkstemp()
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_equal(self):
+        # Equal ranges agree with Network.partition, even for wide addresses
+        generator = random.Random(0)
+        for network in (Network256, IPv4, IPv6):
+            partitioner = RangePartitioner.equal(network.address_space, 7)
+            self.assertEqual(len(partitioner), 7)
+            addresses = [0, network.address_space - 1] + \
+                [generator.randrange(network.address_space)
+                 for _ in xrange(1000)] + partitioner.boundaries + \
+                map(lambda boundary: boundary - 1, partitioner.boundaries)
+            for address in addresses:
+                self.assertEqual(partitioner(address),
+                                 network.partition(address, 7))
+
+    def test_balance(self):
+        # Clustered addresses are divided evenly
+        generator = random.Random(1)
+        addresses = [generator.randrange(2**20) for _ in xrange(20000)] + \
+                    [2**100 + generator.randrange(2**20)
+                     for _ in xrange(20000)]
+        partitioner = RangePartitioner.from_sample(
+            generator.sample(addresses, 4000), 8)
+        counts = [0] * 8
+        for address in addresses:
+            counts[partitioner(address)] += 1
+        self.assertEqual(partitioner.boundaries,
+                         sorted(partitioner.boundaries))
+        self.assertTrue(max(counts) < 1.2 * len(addresses) / 8)
+
+    def write(self, addresses):
+        with open(self.filename, 'w') as stream:
+            for address in addresses:
+                stream.write('%d\t1\t0\t0\n' % address)
+
+    def test_network_file(self):
+        generator = random.Random(2)
+        addresses = sorted(generator.randrange(2**16) * 2**16
+                           for _ in xrange(3000))
+        self.write(addresses)
+        self.assertEqual(
+            RangePartitioner.from_network_file(self.filename, 4,
+                                               2**32).boundaries,
+            RangePartitioner.from_sample(addresses, 4).boundaries)
+
+        # Large inputs are sampled at random offsets
+        samples_per_partition = RangePartitioner.samples_per_partition
+        RangePartitioner.samples_per_partition = 16
+        try:
+            partitioner = RangePartitioner.from_network_file(self.filename,
+                                                             4, 2**32)
+        finally:
+            RangePartitioner.samples_per_partition = samples_per_partition
+        self.assertEqual(len(partitioner), 4)
+        self.assertTrue(set(partitioner.boundaries) <= set(addresses))
+
+        # Empty inputs fall back to equal ranges
+        self.write([])
+        self.assertEqual(
+            RangePartitioner.from_network_file(self.filename, 4,
+                                               2**32).boundaries,
+            RangePartitioner.equal(2**32, 4).boundaries)
+
+    def test_dumps(self):
+        partitioner = RangePartitioner([5, 2**64, 2**127 + 3])
+        self.assertEqual(RangePartitioner.loads(partitioner.dumps())
+                                         .boundaries, partitioner.boundaries)
+        self.assertEqual(map(partitioner, [0, 5, 2**64 - 1, 2**128 - 1]),
+                         [0, 1, 1, 3])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import random
+import unittest
+from StringIO import StringIO
+from Utilities.RecordReader import RecordReader
+
+class RecordReaderTest(unittest.TestCase):
+    """ Checks block-buffered reading against reading line by line """
+
+    def lines(self, generator):
+        return ['%d\t%s' % (index, 'x' * generator.randint(0, 40))
+                for index in xrange(500)]
+
+    def test_blocks(self):
+        generator = random.Random(0)
+        lines = self.lines(generator)
+        text = '\n'.join(line + '\n' * generator.randint(1, 2)
+                         for line in lines)
+        for block_size in (1, 7, 64, 2**20):
+            for ending in ('', '\n'):
+                reader = RecordReader(StringIO(text.rstrip('\n') + ending),
+                                      block_size=block_size)
+                self.assertEqual(list(reader), lines)
+
+    def test_peek(self):
+        lines = self.lines(random.Random(1))
+        parse = lambda line: int(line.split('\t')[0])
+        reader = RecordReader(StringIO('\n'.join(lines)), parse, 16)
+        # Alternate between peeking, consuming and pushing back
+        for index in xrange(len(lines)):
+            self.assertEqual(reader.peek(), index)
+            self.assertEqual(reader.peek(), index)
+            self.assertEqual(reader.next(), index)
+            if index % 3 == 0:
+                reader.push_back(index)
+                self.assertEqual(reader.next(), index)
+        self.assertEqual(reader.peek('end'), 'end')
+        self.assertRaises(StopIteration, reader.next)
+
+    def test_push_back(self):
+        reader = RecordReader(StringIO('1\n2\n'), int)
+        self.assertEqual(reader.next(), 1)
+        reader.push_back(1)
+        reader.push_back(0)
+        self.assertEqual(list(reader), [0, 1, 2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import numpy
+from Network.Network import Network256, IPv4, IPv6
+from Network.ScanStrategy import ScanStrategy, LocalSubnetScan, \
+                                 PermutationScan
+
+class PermutationScanTest(unittest.TestCase):
+    """ Checks that permutation scanning walks a bijection """
+
+    def test_bijection(self):
+        strategy = PermutationScan(Network256)
+        positions = numpy.arange(256, dtype=Network256.address_dtype())
+        addresses = strategy.permute(positions)
+        self.assertEqual(sorted(addresses.tolist()), range(256))
+        self.assertEqual(strategy.unpermute(addresses).tolist(),
+                         positions.tolist())
+
+    def test_round_trip(self):
+        numpy.random.seed(0)
+        for network in (Network256, IPv4, IPv6):
+            strategy = PermutationScan(network)
+            positions = network.random_addresses(1000)
+            self.assertEqual(
+                strategy.unpermute(strategy.permute(positions)).tolist(),
+                positions.tolist())
+
+    def test_targets(self):
+        # Targets continue along the permutation from the source address
+        strategy = PermutationScan(Network256)
+        sources = [3, 200]
+        targets = strategy.targets(sources, 4, iteration=2)
+        positions = strategy.unpermute(numpy.array(
+            sources, dtype=Network256.address_dtype()))
+        self.assertEqual(strategy.unpermute(targets).tolist(),
+                         [(position + offset) % 256
+                          for position in positions.tolist()
+                          for offset in xrange(9, 13)])
+
+class KeyedScanTest(unittest.TestCase):
+    """ Checks that random scans are keyed on the source and iteration """
+
+    def test_keyed(self):
+        for name in ('uniform', 'local-subnet'):
+            for network in (Network256, IPv4, IPv6):
+                strategy = ScanStrategy.create(name, network, seed=7)
+                sources = network.random_addresses(50).tolist()
+                targets = strategy.targets(sources, 3, iteration=1).tolist()
+                self.assertEqual(len(targets), 150)
+                self.assertTrue(all(0 <= target < network.address_space
+                                    for target in targets))
+                # The same seed gives the same targets, whatever the batch
+                self.assertEqual(ScanStrategy.create(name, network, seed=7)
+                                     .targets(sources[10:], 3, 1).tolist(),
+                                 targets[30:])
+                self.assertNotEqual(strategy.targets(sources, 3, 2).tolist(),
+                                    targets)
+                self.assertNotEqual(ScanStrategy.create(name, network, 8)
+                                        .targets(sources, 3, 1).tolist(),
+                                    targets)
+
+    def test_local_subnet(self):
+        strategy = LocalSubnetScan(IPv4, seed=0)
+        sources = IPv4.random_addresses(1000).tolist()
+        targets = strategy.targets(sources, 4).tolist()
+        local = sum(target >> 16 == source >> 16 for source, target in
+                    zip(numpy.repeat(sources, 4).tolist(), targets))
+        self.assertTrue(1800 < local < 2200)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+from Utilities.PartitionManifest import PartitionManifest
+from Utilities.RecordReader import RecordReader
+from Utilities.SchimmyMRJob import SchimmyMRJob, SchimmyException
+
+class CountingJob(SchimmyMRJob):
+    """
+    Keys below 100 belong to partition 0.  Nodes count the edges they have
+    received; each reduced key sends an edge to the key before it, and to a
+    key in another partition.
+    """
+
+    def partition(self, key):
+        return int(key >= 100)
+
+    def get_sentinel(self, partition):
+        return -1
+
+    def is_partition_record(self, key, value):
+        return value[0] == 'node'
+
+    def reducer(self, key, values):
+        self.reduced.append(key)
+        yield key, ['node', sum(value[1] for value in values)]
+        yield key - 1, ['edge', 1]
+        yield key + 100, ['edge', 1]
+
+class SchimmyMRJobTest(unittest.TestCase):
+    """ Checks the merge join of shuffled keys with partition files """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.variable = \
+            SchimmyMRJob.partition_directory_jobconf.replace('.', '_')
+        os.environ[self.variable] = self.directory
+
+    def tearDown(self):
+        del os.environ[self.variable]
+        shutil.rmtree(self.directory)
+
+    def reduce(self, step_num, keys, partition_file=None):
+        """
+        Runs the reducer of partition 0 over a step that shuffles an edge to
+        each of the given keys; returns the keys reduced and the records of
+        the partition file written
+        """
+        job = CountingJob(args=['--partitions', '1'])
+        job.options.step_num = step_num
+        job.reduced = []
+        if not partition_file is None:
+            job._partition_file = RecordReader(StringIO(partition_file),
+                                               job.partition_protocol.read)
+
+        output = list(job._reducer((0, -1), iter([len(keys)])))
+        for key in keys:
+            output += job._reducer((0, key), iter([['edge', 1]]))
+        self.assertEqual(output[::3], [(key, ['node', count]) for key, count
+                                       in self.read_partition(step_num)])
+        return job.reduced, self.read_partition(step_num)
+
+    def read_partition(self, step_num):
+        directory = '%s/step-output/%d' % (self.directory, step_num)
+        with open('%s/_partition-00000' % directory) as stream:
+            records = map(lambda (key, value): (key, value[1]),
+                          RecordReader(stream,
+                                       CountingJob.INTERNAL_PROTOCOL().read))
+        with open('%s/_manifest-00000' % directory) as stream:
+            self.assertEqual(PartitionManifest.parse(stream.read()).entries,
+                {0: (0, '_partition-00000', records[0][0], records[-1][0],
+                     len(records))})
+        return records
+
+    def test_exactly_once(self):
+        # Edges in the initial partition file are not joined
+        reduced, records = self.reduce(0, [15, 20, 40],
+            '10\t["node", 0]\n20\t["edge", 5]\n20\t["node", 0]\n'
+            '30\t["node", 0]\n')
+        self.assertEqual(reduced, [10, 15, 20, 30, 40])
+        self.assertEqual(records, [(10, 0), (15, 1), (20, 1), (30, 0),
+                                   (40, 1)])
+
+        # The following step joins with the partition file just written
+        # (located through its manifest), whose keys are each reduced once
+        reduced, records = self.reduce(1, [14, 29, 50])
+        self.assertEqual(reduced, [10, 14, 15, 20, 29, 30, 40, 50])
+        self.assertEqual(records, [(10, 0), (14, 1), (15, 1), (20, 1),
+                                   (29, 1), (30, 0), (40, 1), (50, 1)])
+
+    def test_out_of_order(self):
+        job = CountingJob(args=['--partitions', '1'])
+        job.options.step_num = 0
+        job._partition_file = RecordReader(StringIO(''))
+        list(job._reducer((0, -1), iter([2])))
+        job.current_partition = 0
+        job._record((20, ['node', 0]))
+        self.assertRaises(SchimmyException, job._record, (10, ['node', 0]))
+        self.assertRaises(SchimmyException, job._record, (20, ['node', 0]))
+        # Records that are not carried forward may arrive in any order
+        job._record((10, ['edge', 0]))
+        job._record((120, ['node', 0]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import Propagate
+import SchimmyPropagate
+from Network.InfectionStatus import InfectionStatus
+from Network.Node import Node, TabSeparatedNodeSerializer
+
+class SchimmyPropagateTest(unittest.TestCase):
+    """
+    Checks that Schimmy propagation, run locally, agrees with propagation
+    that shuffles the whole network (permutation scans are deterministic).
+    Hit lists are either absent or deferred, since ties between hit lists
+    of equal length are broken by reduce order, which differs between the
+    two.
+    """
+
+    def setUp(self):
+        handle, self.filename = tempfile.mkstemp()
+        os.close(handle)
+
+    def write_network(self, hit_list_size):
+        """ Writes a network in which about a tenth of the nodes are infected """
+        generator = random.Random(0)
+        addresses = sorted(generator.sample(xrange(256), 128))
+        with open(self.filename, 'w') as stream:
+            for address in addresses:
+                infected = generator.random() < 0.1
+                node = Node(address, InfectionStatus.INFECTED if infected
+                                     else InfectionStatus.VULNERABLE,
+                            generator.sample(addresses, hit_list_size)
+                            if infected else [])
+                stream.write(TabSeparatedNodeSerializer.serialize(node)+'\n')
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def run_job(self, job_type, args):
+        job_type._initialized = False
+        job = job_type(args=['-r', 'local', '--network', 'Network256',
+                             '--iterations', '4',
+                             '--scan-strategy', 'permutation'] + args +
+                            [self.filename])
+        with job.make_runner() as runner:
+            runner.run()
+            return sorted(runner.stream_output())
+
+    def compare(self, *args):
+        expected = self.run_job(Propagate.Propagate, list(args))
+        self.assertEqual(self.run_job(SchimmyPropagate.Propagate,
+                                      ['--partitions', '3'] + list(args)),
+                         expected)
+
+    def test_temporary_paths(self):
+        # The partition archive is removed along with the other files
+        # created for the run
+        self.write_network(0)
+        SchimmyPropagate.Propagate._initialized = False
+        job = SchimmyPropagate.Propagate(args=['-r', 'local',
+            '--network', 'Network256', '--partitions', '3', self.filename])
+        try:
+            archive = job.options.upload_archives[-1].split('#')[0]
+            self.assertTrue(os.path.getsize(archive) > 0)
+            self.assertTrue(archive in job.temporary_paths)
+        finally:
+            for path in job.temporary_paths:
+                if os.path.isdir(path): shutil.rmtree(path)
+                elif os.path.exists(path): os.remove(path)
+
+    def test_random_scans(self):
+        self.write_network(0)
+        self.compare('--propagation-delay', '1',
+                     '--scans-per-iteration', '2')
+
+    def test_hit_lists(self):
+        # The hit lists of the input are used up in the first iteration
+        self.write_network(8)
+        self.compare('--scans-per-iteration', '8')
+
+    def test_deferred_hit_lists(self):
+        # Hit lists are handed off through HANDOFF records in the next step
+        self.write_network(8)
+        self.compare('--scans-per-iteration', '2', '--defer-hit-lists', '1')
+
+if __name__ == '__main__':
+    unittest.main()
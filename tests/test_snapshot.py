@@ -0,0 +1,119 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+from StringIO import StringIO
+from Analyze import Analyze
+from Engine.NetworkState import NetworkState
+from Network.InfectionStatus import InfectionStatus
+from Network.Network import IPv4, IPv6
+from Network.Node import Node, TabSeparatedNodeSerializer
+from Utilities.Snapshot import Snapshot
+
+def random_nodes(network, count, generator):
+    """ Generates random nodes (edges follow the nodes, as in snapshots) """
+    addresses = sorted(generator.sample(xrange(network.address_space), count)) \
+        if network.address_space <= 2**32 else \
+        sorted(set(generator.randrange(network.address_space)
+                   for _ in xrange(count)))
+    for address in addresses:
+        yield Node(address,
+                   generator.choice([InfectionStatus.VULNERABLE,
+                                     InfectionStatus.INFECTED,
+                                     InfectionStatus.IMMUNE]),
+                   [generator.randrange(network.address_space)
+                    for _ in xrange(generator.choice([0, 0, 1, 5]))],
+                   generator.randint(0, 3),
+                   generator.randrange(network.address_space))
+    for address in addresses[:count/4]:
+        yield Node(address, generator.choice([InfectionStatus.INFECTING,
+                                              InfectionStatus.SUCCESSFUL]),
+                   source=generator.randrange(network.address_space))
+
+def text(nodes):
+    return map(TabSeparatedNodeSerializer.serialize, nodes)
+
+class SnapshotTest(unittest.TestCase):
+    """ Checks that networks survive conversion to and from snapshots """
+
+    def setUp(self):
+        handle, self.filename = tempfile.mkstemp(suffix='.snapshot')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def write(self, network, nodes):
+        node_count = len(filter(lambda node: node.status in
+            (InfectionStatus.VULNERABLE, InfectionStatus.INFECTED,
+             InfectionStatus.IMMUNE), nodes))
+        Snapshot.write(self.filename, network, node_count,
+                       [node.address for node in nodes],
+                       [node.source for node in nodes],
+                       [node.propagation_delay for node in nodes],
+                       [node.status for node in nodes],
+                       dict((row, node.hit_list) for row, node in
+                            enumerate(nodes) if node.hit_list))
+
+    def test_round_trip(self):
+        for network in (IPv4, IPv6):
+            nodes = list(random_nodes(network, 300, random.Random(2)))
+            self.write(network, nodes)
+            self.assertTrue(Snapshot.is_snapshot(self.filename))
+            snapshot = Snapshot.read(self.filename)
+            self.assertEqual(snapshot.network, network)
+            self.assertEqual(text(snapshot.nodes()), text(nodes))
+
+    def test_network_state(self):
+        # Successful edges that do not match a node are dropped on loading
+        for network in (IPv4, IPv6):
+            nodes = list(random_nodes(network, 300, random.Random(4)))
+            state = NetworkState.from_nodes(network, nodes)
+            state.save_snapshot(self.filename)
+            self.assertEqual(text(NetworkState.load(network,
+                                                    self.filename).nodes()),
+                             text(state.nodes()))
+
+    def test_as_text(self):
+        nodes = list(random_nodes(IPv4, 300, random.Random(3)))
+        self.write(IPv4, nodes)
+        temporary_paths = []
+        filename = Snapshot.as_text(self.filename, temporary_paths)
+        try:
+            self.assertEqual(temporary_paths, [filename])
+            with open(filename) as stream:
+                self.assertEqual(stream.read().splitlines(), text(nodes))
+            # Text files are used as-is
+            self.assertEqual(Snapshot.as_text(filename, temporary_paths),
+                             filename)
+            self.assertEqual(temporary_paths, [filename])
+        finally:
+            os.remove(filename)
+
+    def analyze(self, filenames):
+        job = Analyze(args=['-r', 'inline', '--quiet'] + filenames)
+        job.stdout = StringIO()
+        job.run_job()
+        return dict(map(lambda line: map(json.loads, line.split('\t')),
+                        job.stdout.getvalue().splitlines()))
+
+    def test_analyze(self):
+        # Snapshots are analyzed directly unless mixed with text inputs
+        nodes = list(random_nodes(IPv4, 300, random.Random(5)))
+        self.write(IPv4, nodes)
+        handle, filename = tempfile.mkstemp()
+        with os.fdopen(handle, 'w') as stream:
+            stream.write('\n'.join(text(nodes)) + '\n')
+        try:
+            expected = self.analyze([filename])
+            self.assertEqual(self.analyze([self.filename]), expected)
+            mixed = self.analyze([self.filename, filename])
+        finally:
+            os.remove(filename)
+        self.assertEqual(mixed, dict((key, value if key == 'max.hitlist'
+                                           else 2 * value)
+                                     for key, value in expected.items()))
+
+if __name__ == '__main__':
+    unittest.main()